@@ -3,16 +3,27 @@ from contextlib import asynccontextmanager
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from fastapi import FastAPI
+from prometheus_client import REGISTRY
 
 from src.config.settings import settings
 from src.database.migration.migration_manager import migration_manager
 from src.database.pool.connection_pool_manager import connection_pool_manager_instance
 from src.exception.exception_handler import InternalException, internal_exception_handler, \
-    internal_retryable_exception_handler, not_found_token_exception_handler, \
-    RotatableException, NotFoundTokenException
-from src.router import token_router, ai_router
+    internal_retryable_exception_handler, not_found_token_exception_handler, invalid_ai_output_exception_handler, \
+    RotatableException, NotFoundTokenException, InvalidAiOutputException, CircuitOpenException, \
+    circuit_open_exception_handler
+from src.http_client.http_client_manager import http_client_manager_instance
+from src.metrics.metrics import track_job
+from src.middleware.request_timing_middleware import RequestTimingMiddleware
+from src.metrics.state_collector import state_collector
+from src.router import token_router, ai_router, monitoring_router
+from src.service.ai.ai_api_errors_writer import ai_api_errors_writer
+from src.service.ai.ai_job_service import ai_job_service
+from src.service.ai.ai_result_cache import ai_result_cache
 from src.service.rotation.cron.tester_scheduled_job import tester_scheduled_job
 from src.service.rotation.cron.token_scheduled_job import unlock_tokens_scheduled_job
+from src.service.rotation.token_health_tracker import token_health_tracker
+from src.service.rotation.token_service import token_service
 from src.util.logger import setup_logging, log_startup_info, get_logger
 
 setup_logging()
@@ -31,23 +42,67 @@ async def lifespan(app: FastAPI):
     await migration_manager.run_migrations()
     logger.info("DB migration has been performed for Postgres.")
 
+    ai_api_errors_writer.start()
+    logger.info("AI API errors writer started")
+
+    await token_health_tracker.load()
+    logger.info("Token health stats loaded")
+
+    await token_service.start_registry()
+    logger.info("Tokens registry started")
+
+    await token_service.start_unlock_scheduler()
+    logger.info("Tokens unlock scheduler started")
+
+    await http_client_manager_instance.connect()
+    logger.info("HTTP clients connected")
+
     scheduler.add_job(unlock_tokens_scheduled_job, CronTrigger.from_crontab(settings.rotation.cron))
     scheduler.add_job(tester_scheduled_job, CronTrigger.from_crontab(settings.rotation_tester.cron))
+    scheduler.add_job(track_job("ai_result_cache_purge")(ai_result_cache.purge), CronTrigger.from_crontab(settings.ai_result_cache.purge_cron))
+    scheduler.add_job(track_job("token_health_persist")(token_health_tracker.persist), CronTrigger.from_crontab(settings.token_health.persist_cron))
     scheduler.start()
 
+    ai_job_service.start()
+
     yield
 
+    await ai_job_service.stop()
+    logger.info("✅ AI jobs workers stopped")
+
+    await http_client_manager_instance.disconnect()
+    logger.info("✅ HTTP clients disconnected")
+
+    await token_service.stop_unlock_scheduler()
+    logger.info("✅ Tokens unlock scheduler stopped")
+
+    await token_service.stop_registry()
+    logger.info("✅ Tokens registry stopped")
+
+    await ai_api_errors_writer.stop()
+    logger.info("✅ AI API errors writer flushed and stopped")
+
+    await token_health_tracker.persist()
+    logger.info("✅ Token health stats persisted")
+
     await connection_pool_manager_instance.disconnect()
     logger.info("✅ DBs pool disconnected")
 
     scheduler.shutdown()
 
 
+REGISTRY.register(state_collector)
+
 app = FastAPI(title="Local OpenAI API Proxy", lifespan=lifespan)
 
+app.add_middleware(RequestTimingMiddleware, request_timing_settings=settings.request_timing)
+
 app.add_exception_handler(InternalException, internal_exception_handler)
 app.add_exception_handler(RotatableException, internal_retryable_exception_handler)
 app.add_exception_handler(NotFoundTokenException, not_found_token_exception_handler)
+app.add_exception_handler(InvalidAiOutputException, invalid_ai_output_exception_handler)
+app.add_exception_handler(CircuitOpenException, circuit_open_exception_handler)
 
 app.include_router(ai_router.router, tags=["AI"])
 app.include_router(token_router.router, tags=["Token"])
+app.include_router(monitoring_router.router, tags=["Monitoring"])
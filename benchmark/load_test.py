@@ -0,0 +1,187 @@
+"""Load benchmark of /ai/processing against a running rotation service backed by the mock LLM provider.
+
+Seeds fake tokens through the service API, drives /ai/processing with unique events at the target
+concurrency, then reports the throughput, latency percentiles, rotations and tokens burned.
+
+    python -m benchmark.load_test --tokens 20 --concurrency 50 --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+# Service counters diffed over the run, as (metric sample name, label filter).
+_SERVICE_COUNTERS: Dict[str, tuple] = {
+    'rotations': ("rotation_attempts_total", {"outcome": "rotated"}),
+    'rotation_retries': ("rotation_retries_total", {}),
+    'http_call_retries': ("ai_http_call_retries_total", {}),
+    'tokens_locked': ("token_locks_total", {}),
+    'tokens_unlocked': ("token_unlocks_total", {}),
+    'lease_timeouts': ("token_lease_timeouts_total", {}),
+}
+
+
+@dataclass
+class RunResult:
+    started_at: float
+    finished_at: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+
+    @property
+    def duration(self) -> float:
+        return self.finished_at - self.started_at
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(percentile / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def _scrape_counters(client: httpx.AsyncClient) -> Dict[str, float]:
+    response = await client.get("/metrics")
+    response.raise_for_status()
+
+    totals: Dict[str, float] = {name: 0.0 for name in _SERVICE_COUNTERS}
+    for family in text_string_to_metric_families(response.text):
+        for sample in family.samples:
+            for name, (sample_name, labels) in _SERVICE_COUNTERS.items():
+                if sample.name == sample_name and all(sample.labels.get(k) == v for k, v in labels.items()):
+                    totals[name] += sample.value
+    return totals
+
+
+async def _seed_tokens(client: httpx.AsyncClient, count: int, api_provider: str, run_id: str) -> List[int]:
+    token_ids: List[int] = []
+    for index in range(count):
+        response = await client.post("/tokens", json={
+            "token": f"benchmark-{run_id}-{index}", "api_provider": api_provider})
+        response.raise_for_status()
+        token_ids.append(response.json()["id"])
+    return token_ids
+
+
+async def _delete_tokens(client: httpx.AsyncClient, token_ids: List[int]) -> None:
+    for token_id in token_ids:
+        response = await client.delete(f"/tokens/{token_id}")
+        response.raise_for_status()
+
+
+async def _drive_load(client: httpx.AsyncClient, args: argparse.Namespace, run_id: str) -> RunResult:
+    result = RunResult(started_at=time.perf_counter())
+    next_index = iter(range(args.requests))
+
+    async def worker() -> None:
+        for index in next_index:
+            body = {
+                "api_provider": args.api_provider,
+                "model": args.model,
+                "raw_event": f"Бенчмарк {run_id}: подія #{index}, вебінар онлайн, безкоштовно.",
+                "bypass_cache": True,
+            }
+            started_at = time.perf_counter()
+            try:
+                response = await client.post("/ai/processing", json=body)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            result.latencies.append(time.perf_counter() - started_at)
+            result.statuses[status] += 1
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    result.finished_at = time.perf_counter()
+    return result
+
+
+def _build_report(args: argparse.Namespace, result: RunResult, service_counters: Dict[str, float],
+                  mock_stats: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    latencies: List[float] = sorted(result.latencies)
+    report: Dict[str, Any] = {
+        'requests': len(latencies),
+        'concurrency': args.concurrency,
+        'tokens': args.tokens,
+        'duration_seconds': round(result.duration, 3),
+        'throughput_rps': round(len(latencies) / result.duration, 2) if result.duration else 0.0,
+        'statuses': dict(result.statuses),
+        'latency_ms': {
+            'mean': round(statistics.fmean(latencies) * 1000, 1) if latencies else 0.0,
+            'p50': round(_percentile(latencies, 50) * 1000, 1),
+            'p90': round(_percentile(latencies, 90) * 1000, 1),
+            'p99': round(_percentile(latencies, 99) * 1000, 1),
+            'max': round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        },
+        'service': service_counters,
+    }
+    if mock_stats is not None:
+        report['upstream'] = mock_stats
+    return report
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(f"requests        {report['requests']} at concurrency {report['concurrency']}, {report['tokens']} tokens")
+    print(f"duration        {report['duration_seconds']} s")
+    print(f"throughput      {report['throughput_rps']} req/s")
+    print(f"statuses        {report['statuses']}")
+    latency = report['latency_ms']
+    print(f"latency ms      mean {latency['mean']}  p50 {latency['p50']}  p90 {latency['p90']}  "
+          f"p99 {latency['p99']}  max {latency['max']}")
+    print("service         " + "  ".join(f"{name} {value:g}" for name, value in report['service'].items()))
+    if 'upstream' in report:
+        print("upstream        " + "  ".join(f"{name} {value}" for name, value in report['upstream'].items()))
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    run_id: str = uuid.uuid4().hex[:8]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.service_url, timeout=args.timeout, limits=limits) as client, \
+            httpx.AsyncClient(base_url=args.mock_url, timeout=10) as mock_client:
+        token_ids: List[int] = await _seed_tokens(client, args.tokens, args.api_provider, run_id)
+        try:
+            await mock_client.post("/_reset")
+            counters_before: Dict[str, float] = await _scrape_counters(client)
+
+            result: RunResult = await _drive_load(client, args, run_id)
+
+            counters_after: Dict[str, float] = await _scrape_counters(client)
+            mock_stats: Dict[str, Any] = (await mock_client.get("/_stats")).json()
+        finally:
+            if not args.keep_tokens:
+                await _delete_tokens(client, token_ids)
+
+    service_counters = {name: counters_after[name] - counters_before[name] for name in _SERVICE_COUNTERS}
+    return _build_report(args, result, service_counters, mock_stats)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--service-url", default="http://127.0.0.1:8080")
+    parser.add_argument("--mock-url", default="http://127.0.0.1:9000")
+    parser.add_argument("--api-provider", default="OpenRouter", choices=["OpenRouter", "OpenAI"])
+    parser.add_argument("--model", default="mock/model")
+    parser.add_argument("--tokens", type=int, default=20, help="fake tokens seeded for the run")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout, seconds")
+    parser.add_argument("--keep-tokens", action="store_true", help="do not delete the seeded tokens afterwards")
+    parser.add_argument("--output", help="also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = asyncio.run(run(args))
+    _print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""OpenAI/OpenRouter-compatible mock LLM provider for the load benchmark.
+
+Answers /chat/completions after a configurable latency and enforces a fixed-window rate limit per token,
+answering 429 with the OpenRouter error payload and the x-ratelimit-* headers the rotation service reads.
+
+    python -m benchmark.mock_llm_server --port 9000 --latency-ms 800 --requests-per-window 20 --window-seconds 60
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+import uvicorn
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+_EVENT_CONTENT = json.dumps({
+    "title": "Бенчмарк подія",
+    "is_asap": False,
+    "is_regular_event": True,
+    "format": "online",
+    "categories": ["вебінар"],
+    "detailed_location": None,
+    "city": None,
+    "price": "free",
+    "date": None,
+    "deadline": None,
+}, ensure_ascii=False)
+
+
+@dataclass
+class MockProviderConfig:
+    latency_seconds: float = 0.8
+    latency_jitter_seconds: float = 0.2
+    requests_per_window: int = 20
+    window_seconds: float = 60.0
+    error_rate: float = 0.0
+
+
+@dataclass
+class _TokenWindow:
+    started_at: float
+    count: int = 0
+
+
+class MockProvider:
+
+    def __init__(self, config: MockProviderConfig) -> None:
+        self._config = config
+        self.reset()
+
+    def reset(self) -> None:
+        self._windows: Dict[str, _TokenWindow] = {}
+        self._requests: int = 0
+        self._completions: int = 0
+        self._rate_limited: int = 0
+        self._errors: int = 0
+        self._tokens_used: Set[str] = set()
+        self._tokens_rate_limited: Set[str] = set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'requests': self._requests,
+            'completions': self._completions,
+            'rate_limited': self._rate_limited,
+            'errors': self._errors,
+            'tokens_used': len(self._tokens_used),
+            'tokens_rate_limited': len(self._tokens_rate_limited),
+        }
+
+    async def complete(self, token: str, body: Dict[str, Any]):
+        self._requests += 1
+        self._tokens_used.add(token)
+
+        now = time.time()
+        window: Optional[_TokenWindow] = self._windows.get(token)
+        if window is None or now - window.started_at >= self._config.window_seconds:
+            window = self._windows[token] = _TokenWindow(started_at=now)
+        window.count += 1
+
+        rate_limit_headers: Dict[str, str] = {
+            "X-RateLimit-Limit": str(self._config.requests_per_window),
+            "X-RateLimit-Remaining": str(max(self._config.requests_per_window - window.count, 0)),
+            "X-RateLimit-Reset": str(int((window.started_at + self._config.window_seconds) * 1000)),
+        }
+
+        if window.count > self._config.requests_per_window:
+            self._rate_limited += 1
+            self._tokens_rate_limited.add(token)
+            return JSONResponse(status_code=429, headers=rate_limit_headers, content={
+                "error": {
+                    "code": 429,
+                    "message": "Rate limit exceeded: free-models-per-min. ",
+                    "metadata": {"headers": rate_limit_headers},
+                }})
+
+        await asyncio.sleep(max(
+            random.gauss(self._config.latency_seconds, self._config.latency_jitter_seconds), 0.0))
+
+        if random.random() < self._config.error_rate:
+            self._errors += 1
+            return JSONResponse(status_code=502, content={"error": {"code": 502, "message": "Mock upstream error"}})
+
+        self._completions += 1
+        if body.get("stream"):
+            return StreamingResponse(
+                self._stream_chunks(body.get("model")), media_type="text/event-stream", headers=rate_limit_headers)
+
+        return JSONResponse(headers=rate_limit_headers, content={
+            "id": f"mock-{self._requests}",
+            "object": "chat.completion",
+            "created": int(now),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": _EVENT_CONTENT},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1500, "completion_tokens": 80, "total_tokens": 1580},
+        })
+
+    @staticmethod
+    async def _stream_chunks(model: Optional[str]) -> AsyncIterator[bytes]:
+        for start in range(0, len(_EVENT_CONTENT), 16):
+            chunk = {"object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": {"content": _EVENT_CONTENT[start:start + 16]}}]}
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode()
+            await asyncio.sleep(0.01)
+        yield b"data: [DONE]\n\n"
+
+
+def create_app(config: MockProviderConfig) -> FastAPI:
+    provider = MockProvider(config)
+    router = APIRouter()
+
+    @router.get("/models")
+    async def get_models():
+        return {"data": [{"id": "mock/model"}]}
+
+    @router.post("/chat/completions")
+    async def chat_completions(request: Request):
+        token: str = request.headers.get("authorization", "").removeprefix("Bearer ")
+        return await provider.complete(token, await request.json())
+
+    app = FastAPI(title="Mock LLM provider")
+    # OpenRouter and OpenAI style base URLs.
+    app.include_router(router, prefix="/api/v1")
+    app.include_router(router, prefix="/v1")
+
+    @app.get("/_stats")
+    async def get_stats():
+        return provider.get_stats()
+
+    @app.post("/_reset")
+    async def reset():
+        provider.reset()
+        return provider.get_stats()
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=800.0)
+    parser.add_argument("--jitter-ms", type=float, default=200.0)
+    parser.add_argument("--requests-per-window", type=int, default=20)
+    parser.add_argument("--window-seconds", type=float, default=60.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = MockProviderConfig(
+        latency_seconds=args.latency_ms / 1000,
+        latency_jitter_seconds=args.jitter_ms / 1000,
+        requests_per_window=args.requests_per_window,
+        window_seconds=args.window_seconds,
+        error_rate=args.error_rate)
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
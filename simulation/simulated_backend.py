@@ -0,0 +1,175 @@
+import asyncio
+import random
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.model.api_provider import ApiProvider
+from src.model.rate_limit_state import RateLimitState
+
+
+@dataclass
+class ProviderModel:
+    """Modeled token pool and upstream provider behind it."""
+    tokens: int = 20
+    requests_per_window: int = 20
+    window_seconds: float = 60.0
+    latency_seconds: float = 2.0
+    latency_jitter_seconds: float = 0.5
+    rate_limited_latency_seconds: float = 0.05
+    error_rate: float = 0.0
+
+
+@dataclass
+class UpstreamOutcome:
+    status: str
+    rate_limit_state: RateLimitState
+    latency_seconds: float
+
+
+class SimulatedTokenRepository:
+    """In-memory stand-in for TokenRepository, covering what TokenService uses. Tracks the locked time per token."""
+
+    def __init__(self, tokens_encrypted: List[str], api_provider: ApiProvider, clock: Callable[[], float]) -> None:
+        self._clock = clock
+        self._tokens: Dict[int, Dict[str, Any]] = {
+            token_id: {'id': token_id, 'api_provider': api_provider.value, 'token_encrypted': token_encrypted,
+                       'locked_at': None, 'unlock_at': None}
+            for token_id, token_encrypted in enumerate(tokens_encrypted, start=1)}
+        self._on_change: Optional[Callable[[Dict[str, Any]], None]] = None
+        self.locked_seconds: float = 0.0
+
+    def close(self) -> None:
+        """Account the tokens still locked at the end of the simulation."""
+        for token in self._tokens.values():
+            if token['locked_at'] is not None:
+                self.locked_seconds += self._clock() - token['locked_at']
+
+    async def get_by_id(self, token_id: int) -> Optional[Dict[str, Any]]:
+        token = self._tokens.get(token_id)
+        return self._to_dict(token) if token else None
+
+    async def get_random_non_locked_by_api_provider(self, api_provider: ApiProvider) -> Optional[Dict[str, Any]]:
+        non_locked = [token for token in self._tokens.values() if token['locked_at'] is None]
+        return self._to_dict(random.choice(non_locked)) if non_locked else None
+
+    async def get_non_locked_tokens(self) -> List[Dict[str, Any]]:
+        return [self._to_dict(token) for token in self._tokens.values() if token['locked_at'] is None]
+
+    async def get_locked_tokens(self) -> List[Dict[str, Any]]:
+        return [self._to_dict(token) for token in self._tokens.values() if token['locked_at'] is not None]
+
+    async def get_locked_tokens_due_for_check(self) -> List[Dict[str, Any]]:
+        now = self._clock()
+        return [
+            self._to_dict(token) for token in self._tokens.values()
+            if token['locked_at'] is not None and (token['unlock_at'] is None or token['unlock_at'] <= now)]
+
+    async def get_scheduled_unlocks(self) -> List[Tuple[int, ApiProvider, datetime]]:
+        return [
+            (token['id'], ApiProvider(token['api_provider']),
+             datetime.fromtimestamp(token['unlock_at'], tz=timezone.utc))
+            for token in self._tokens.values() if token['locked_at'] is not None and token['unlock_at'] is not None]
+
+    async def lock_token(self, token_id: int, unlock_at: Optional[datetime] = None) -> Optional[ApiProvider]:
+        token = self._tokens.get(token_id)
+        if token is None or token['locked_at'] is not None:
+            return None
+        token['locked_at'] = self._clock()
+        token['unlock_at'] = unlock_at.timestamp() if unlock_at is not None else None
+        self._notify(token)
+        return ApiProvider(token['api_provider'])
+
+    async def unlock_token(self, token_id: int) -> bool:
+        return bool(await self.unlock_tokens([token_id]))
+
+    async def unlock_tokens(self, token_ids: List[int]) -> List[int]:
+        unlocked_ids: List[int] = []
+        for token_id in token_ids:
+            token = self._tokens.get(token_id)
+            if token is not None and token['locked_at'] is not None:
+                self.locked_seconds += self._clock() - token['locked_at']
+                token['locked_at'] = token['unlock_at'] = None
+                unlocked_ids.append(token_id)
+                self._notify(token)
+        return unlocked_ids
+
+    async def listen_changes(self, on_change: Callable[[Dict[str, Any]], None],
+                             on_termination: Callable[[], None]) -> object:
+        self._on_change = on_change
+        return object()
+
+    async def stop_listening(self, conn: object) -> None:
+        self._on_change = None
+
+    def _notify(self, token: Dict[str, Any]) -> None:
+        """Publish the change the way the tokens table trigger does, delivered on the next loop iteration."""
+        if self._on_change is None:
+            return
+        change: Dict[str, Any] = {**self._to_dict(token), 'operation': 'UPDATE',
+                                  'locked': token['locked_at'] is not None, 'unlock_at': token['unlock_at']}
+        asyncio.get_running_loop().call_soon(self._on_change, change)
+
+    @staticmethod
+    def _to_dict(token: Dict[str, Any]) -> Dict[str, Any]:
+        return {'id': token['id'], 'api_provider': token['api_provider'], 'token_encrypted': token['token_encrypted']}
+
+
+class SimulatedTokenHealthRepository:
+    """In-memory stand-in for TokenHealthRepository."""
+
+    def __init__(self) -> None:
+        self.stats: Dict[int, Dict[str, Any]] = {}
+
+    async def get_all_stats(self) -> List[Dict[str, Any]]:
+        return list(self.stats.values())
+
+    async def save_stats(self, stats: List[Dict[str, Any]]) -> None:
+        for row in stats:
+            self.stats[row['token_id']] = row
+
+
+class SimulatedProvider:
+    """Upstream provider with a fixed rate-limit window per token, opened by the first request of the token."""
+
+    def __init__(self, model: ProviderModel, clock: Callable[[], float]) -> None:
+        self._model = model
+        self._clock = clock
+        self._windows: Dict[str, List[float]] = {}
+        self.calls: int = 0
+        self.completions: int = 0
+        self.rate_limited: int = 0
+        self.errors: int = 0
+
+    async def call(self, token: str) -> UpstreamOutcome:
+        self.calls += 1
+        state: RateLimitState = self._count_request(token)
+
+        if state.remaining < 0:
+            self.rate_limited += 1
+            await asyncio.sleep(self._model.rate_limited_latency_seconds)
+            return UpstreamOutcome("rate_limited", state, self._model.rate_limited_latency_seconds)
+
+        latency_seconds = max(random.gauss(self._model.latency_seconds, self._model.latency_jitter_seconds), 0.0)
+        await asyncio.sleep(latency_seconds)
+        if random.random() < self._model.error_rate:
+            self.errors += 1
+            return UpstreamOutcome("error", state, latency_seconds)
+
+        self.completions += 1
+        return UpstreamOutcome("ok", state, latency_seconds)
+
+    def probe(self, token: str) -> bool:
+        """Rate-limit check of a locked token, the way the unlock job does it: the probe is a request too."""
+        return self._count_request(token).remaining >= 0
+
+    def _count_request(self, token: str) -> RateLimitState:
+        now = self._clock()
+        window: Optional[List[float]] = self._windows.get(token)
+        if window is None or now >= window[0] + self._model.window_seconds:
+            window = self._windows[token] = [now, 0]
+        window[1] += 1
+        return RateLimitState(
+            limit=self._model.requests_per_window,
+            remaining=self._model.requests_per_window - int(window[1]),
+            reset_at=window[0] + self._model.window_seconds)
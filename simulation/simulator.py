@@ -0,0 +1,286 @@
+"""Discrete-event simulator of the token rotation, for choosing the rotation settings offline.
+
+Runs the real RotatableService/TokenService/TokenRegistry logic on a virtual-time event loop, replaying
+a request arrival trace over a modeled token pool, and compares the given policies by the achieved
+throughput, latency and token utilization. Hours of traffic take seconds.
+
+    python -m simulation.simulator --rate 2 --duration 3600 --tokens 20 \\
+        --policy name=least_loaded --policy name=round_robin,selection_strategy=round_robin
+"""
+import argparse
+import asyncio
+import dataclasses
+import logging
+import os
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from cryptography.fernet import Fernet
+
+# The service modules build their settings at import time; nothing is connected to in the simulation.
+for _name, _value in {
+        "POSTGRES_HOST": "localhost", "POSTGRES_PORT": "5432", "POSTGRES_DATABASE": "simulation",
+        "POSTGRES_USERNAME": "simulation", "POSTGRES_PASSWORD": "simulation",
+        "TOKEN_ENCRYPTION_SECRET_KEY": Fernet.generate_key().decode(),
+        "ROTATION_CRON": "* * * * *", "ROTATION_TESTER_CRON": "0 0 1 1 *", "ROTATION_TESTER_EVENTS_LIMIT": "0",
+        "OPEN_ROUTER_ROTATION_RETRY_COUNT": "3", "OPEN_ROUTER_HTTP_CALL_RETRY_COUNT": "3",
+        "OPEN_AI_ROTATION_RETRY_COUNT": "3", "OPEN_AI_HTTP_CALL_RETRY_COUNT": "3"}.items():
+    os.environ.setdefault(_name, _value)
+
+import backoff  # noqa: E402
+
+from simulation.simulated_backend import ProviderModel, SimulatedProvider, SimulatedTokenHealthRepository, \
+    SimulatedTokenRepository  # noqa: E402
+from simulation.virtual_time_loop import VirtualTimeEventLoop  # noqa: E402
+from src.config.settings import TokenHealthSettings, TokenLeaseSettings  # noqa: E402
+from src.exception.exception_handler import AiHttpCallRetryableException, NotFoundTokenException, \
+    RotatableException  # noqa: E402
+from src.model.api_provider import ApiProvider  # noqa: E402
+from src.model.api_token import ApiToken  # noqa: E402
+from src.model.token_lease import TokenLease  # noqa: E402
+from src.model.token_selection_strategy import TokenSelectionStrategy  # noqa: E402
+from src.service.rotation.rotatable_service import RotatableService  # noqa: E402
+from src.service.rotation.token_decryption_cache import TokenDecryptionCache  # noqa: E402
+from src.service.rotation.token_encryptor import TokenEncryptor  # noqa: E402
+from src.service.rotation.token_health_tracker import TokenHealthTracker  # noqa: E402
+from src.service.rotation.token_registry import TokenRegistry  # noqa: E402
+from src.service.rotation.token_service import TokenService  # noqa: E402
+from src.util.logger import setup_logging  # noqa: E402
+
+_API_PROVIDER = ApiProvider.OPEN_ROUTER
+
+
+@dataclass
+class SimulationPolicy:
+    """Rotation settings under test, the defaults match the service ones."""
+    name: str = "default"
+    selection_strategy: TokenSelectionStrategy = TokenSelectionStrategy.HEALTH_WEIGHTED
+    max_concurrency_per_token: int = 4
+    rate_limit_reserve: int = 1
+    lease_timeout_seconds: float = 30.0
+    rotation_retry_count: int = 3
+    http_call_retry_count: int = 3
+    cron_interval_seconds: float = 60.0
+    # Whether the locks carry the provider's reset time, so the tokens get unlocked on schedule.
+    use_unlock_hints: bool = True
+    # Whether the tokens get paused ahead of the 429 from the x-ratelimit-* headers.
+    use_rate_limit_headers: bool = True
+
+
+class SimulatedProcessorService(RotatableService):
+    """AiProcessorService counterpart calling the simulated provider; the rotation itself is the real one."""
+
+    def __init__(self, policy: SimulationPolicy, token_service: TokenService, provider: SimulatedProvider) -> None:
+        super().__init__(rotation_retry_count=policy.rotation_retry_count)
+        self._policy = policy
+        self._token_service = token_service
+        self._provider = provider
+        self.rotations: int = 0
+
+    async def _process_with_retry(self, lease: TokenLease) -> None:
+        async def wrapped():
+            return await self._process_with_retry_internal(lease)
+
+        retryable = backoff.on_exception(
+            backoff.expo, AiHttpCallRetryableException, max_tries=self._policy.http_call_retry_count)(wrapped)
+        return await retryable()
+
+    async def _process_with_retry_internal(self, lease: TokenLease) -> None:
+        outcome = await self._provider.call(lease.api_token.value)
+        if outcome.status == "rate_limited":
+            unlock_at: Optional[float] = outcome.rate_limit_state.reset_at if self._policy.use_unlock_hints else None
+            self._token_service.record_rate_limited(lease)
+            raise RotatableException("Rate limit exceeded", None, unlock_at)
+        if outcome.status == "error":
+            raise AiHttpCallRetryableException("Upstream error")
+        self._token_service.record_success(lease, outcome.latency_seconds)
+        if self._policy.use_rate_limit_headers:
+            self._token_service.update_rate_limit(lease, outcome.rate_limit_state)
+
+    async def _lease_token(self) -> TokenLease:
+        lease: Optional[TokenLease] = await self._token_service.lease(_API_PROVIDER)
+        if lease is None:
+            raise NotFoundTokenException(f"No API key available for {_API_PROVIDER}.")
+        return lease
+
+    async def _release_token(self, lease: TokenLease) -> None:
+        await self._token_service.release(lease)
+
+    async def _retire_token(self, lease: TokenLease, unlock_at: Optional[float]) -> None:
+        self.rotations += 1
+        await self._token_service.lock_leased(lease, unlock_at)
+
+
+async def _run_unlock_job(policy: SimulationPolicy, token_service: TokenService, provider: SimulatedProvider) -> None:
+    while True:
+        await asyncio.sleep(policy.cron_interval_seconds)
+        locked_tokens: List[ApiToken] = await token_service.get_locked_tokens_due_for_check()
+        await token_service.unlock_many([
+            locked_token.token_id for locked_token in locked_tokens if provider.probe(locked_token.value)])
+
+
+async def _simulate(policy: SimulationPolicy, provider_model: ProviderModel, arrivals: List[float]) -> Dict[str, Any]:
+    loop = asyncio.get_running_loop()
+    encryptor = TokenEncryptor(Fernet.generate_key())
+    repository = SimulatedTokenRepository(
+        [encryptor.encrypt(f"simulated-token-{index}") for index in range(provider_model.tokens)],
+        _API_PROVIDER, loop.time)
+    token_lease_settings = TokenLeaseSettings(
+        TOKEN_SELECTION_STRATEGY=policy.selection_strategy,
+        TOKEN_MAX_CONCURRENCY=policy.max_concurrency_per_token,
+        TOKEN_LEASE_TIMEOUT_SECONDS=policy.lease_timeout_seconds,
+        TOKEN_RATE_LIMIT_RESERVE=policy.rate_limit_reserve)
+    health_tracker = TokenHealthTracker(SimulatedTokenHealthRepository(), TokenHealthSettings(), clock=loop.time)
+    token_service = TokenService(
+        repository, encryptor, TokenDecryptionCache(provider_model.tokens, float("inf")),
+        TokenRegistry(token_lease_settings, health_tracker, clock=loop.time), health_tracker, token_lease_settings,
+        clock=loop.time)
+    provider = SimulatedProvider(provider_model, loop.time)
+    service = SimulatedProcessorService(policy, token_service, provider)
+
+    await token_service.start_registry()
+    await token_service.start_unlock_scheduler()
+    unlock_job = loop.create_task(_run_unlock_job(policy, token_service, provider))
+
+    latencies: List[float] = []
+    outcomes: Counter = Counter()
+
+    async def handle_request() -> None:
+        started_at = loop.time()
+        try:
+            await service.process_with_token_rotation()
+            latencies.append(loop.time() - started_at)
+            outcomes["completed"] += 1
+        except Exception as e:
+            outcomes[type(e).__name__] += 1
+
+    requests: List[asyncio.Task] = []
+    started_at = loop.time()
+    for arrival in arrivals:
+        await asyncio.sleep(started_at + arrival - loop.time())
+        requests.append(loop.create_task(handle_request()))
+    await asyncio.gather(*requests)
+    span: float = max(loop.time() - started_at, 1e-9)
+
+    unlock_job.cancel()
+    await token_service.stop_unlock_scheduler()
+    await token_service.stop_registry()
+    repository.close()
+
+    latencies.sort()
+    capacity: float = provider_model.tokens * provider_model.requests_per_window * span / provider_model.window_seconds
+    return {
+        'policy': policy.name,
+        'requests': len(arrivals),
+        'completed': outcomes.pop("completed", 0),
+        'failed': dict(outcomes),
+        'simulated_seconds': round(span, 1),
+        'throughput_rps': round(len(latencies) / span, 3),
+        'latency_p50': round(_percentile(latencies, 50), 2),
+        'latency_p90': round(_percentile(latencies, 90), 2),
+        'latency_p99': round(_percentile(latencies, 99), 2),
+        'latency_max': round(latencies[-1], 2) if latencies else 0.0,
+        'upstream_calls': provider.calls,
+        'rate_limited': provider.rate_limited,
+        'rotations': service.rotations,
+        'token_utilization': round(min(provider.completions / capacity, 1.0), 3) if capacity else 0.0,
+        'locked_fraction': round(repository.locked_seconds / (provider_model.tokens * span), 3),
+    }
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(round(percentile / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)]
+
+
+def simulate(policy: SimulationPolicy, provider_model: ProviderModel, arrivals: List[float],
+             seed: int = 0) -> Dict[str, Any]:
+    """Replay the arrivals (seconds from the start) under the policy on a fresh virtual-time loop."""
+    random.seed(seed)
+    loop = VirtualTimeEventLoop()
+    wall_started_at = time.perf_counter()
+    try:
+        report: Dict[str, Any] = loop.run_until_complete(_simulate(policy, provider_model, arrivals))
+    finally:
+        loop.close()
+    report['wall_seconds'] = round(time.perf_counter() - wall_started_at, 2)
+    return report
+
+
+def generate_poisson_arrivals(rate: float, duration: float, seed: int = 0) -> List[float]:
+    rng = random.Random(seed)
+    arrivals: List[float] = []
+    arrival = rng.expovariate(rate)
+    while arrival < duration:
+        arrivals.append(arrival)
+        arrival += rng.expovariate(rate)
+    return arrivals
+
+
+def load_trace(path: str) -> List[float]:
+    """Arrival times in seconds, one per line; absolute timestamps are shifted to start at 0."""
+    with open(path, encoding="utf-8") as trace:
+        arrivals = sorted(float(line) for line in trace if line.strip() and not line.startswith("#"))
+    return [arrival - arrivals[0] for arrival in arrivals] if arrivals else []
+
+
+def parse_policy(spec: str) -> SimulationPolicy:
+    """Parse 'name=rr,selection_strategy=round_robin,cron_interval_seconds=300' into a policy."""
+    field_types: Dict[str, Any] = {policy_field.name: policy_field.type for policy_field in dataclasses.fields(SimulationPolicy)}
+    values: Dict[str, Any] = {}
+    for assignment in filter(None, spec.split(",")):
+        name, _, raw_value = assignment.partition("=")
+        name = name.strip()
+        if name not in field_types:
+            raise argparse.ArgumentTypeError(f"Unknown policy setting '{name}'.")
+        field_type = field_types[name]
+        if field_type is bool:
+            values[name] = raw_value.strip().lower() in ("1", "true", "yes")
+        else:
+            values[name] = field_type(raw_value.strip())
+    return SimulationPolicy(**values)
+
+
+def _print_reports(reports: List[Dict[str, Any]]) -> None:
+    columns = ['policy', 'completed', 'failed', 'throughput_rps', 'latency_p50', 'latency_p90', 'latency_p99',
+               'rate_limited', 'rotations', 'token_utilization', 'locked_fraction', 'wall_seconds']
+    rows = [[str(report[column]) for column in columns] for report in reports]
+    widths = [max(len(column), *(len(row[index]) for row in rows)) for index, column in enumerate(columns)]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(value.ljust(width) for value, width in zip(row, widths)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trace", help="file with the request arrival times, one per line")
+    parser.add_argument("--rate", type=float, default=1.0, help="Poisson arrivals per second, without --trace")
+    parser.add_argument("--duration", type=float, default=3600.0, help="seconds of arrivals, without --trace")
+    parser.add_argument("--policy", type=parse_policy, action="append",
+                        help="policy settings as key=value pairs, repeat to compare several policies")
+    parser.add_argument("--seed", type=int, default=0)
+    for provider_field in dataclasses.fields(ProviderModel):
+        parser.add_argument(f"--{provider_field.name.replace('_', '-')}", dest=provider_field.name,
+                            type=provider_field.type, default=provider_field.default)
+    args = parser.parse_args()
+
+    setup_logging()
+    # The rotation logs every lock and backoff, way too much for hours of traffic.
+    logging.getLogger().setLevel(logging.ERROR)
+    logging.getLogger("backoff").setLevel(logging.CRITICAL)
+
+    arrivals: List[float] = load_trace(args.trace) if args.trace else generate_poisson_arrivals(
+        args.rate, args.duration, args.seed)
+    provider_model = ProviderModel(**{
+        provider_field.name: getattr(args, provider_field.name) for provider_field in dataclasses.fields(ProviderModel)})
+
+    reports = [simulate(policy, provider_model, arrivals, args.seed) for policy in args.policy or [SimulationPolicy()]]
+    _print_reports(reports)
+
+
+if __name__ == "__main__":
+    main()
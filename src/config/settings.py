@@ -1,6 +1,12 @@
+from typing import List
+
 from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from src.model.ai_route import AiRoute
+from src.model.api_provider import ApiProvider
+from src.model.token_selection_strategy import TokenSelectionStrategy
+
 
 class PostgresSettings(BaseSettings):
     host: str = Field(alias="POSTGRES_HOST")
@@ -31,8 +37,16 @@ class TokenEncryptionSettings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 
+class TokenDecryptionCacheSettings(BaseSettings):
+    max_size: int = Field(default=10_000, alias="TOKEN_DECRYPTION_CACHE_SIZE")
+    ttl_seconds: float = Field(default=3600.0, alias="TOKEN_DECRYPTION_CACHE_TTL_SECONDS")
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+
 class RotationJobSettings(BaseSettings):
     cron: str = Field(alias="ROTATION_CRON")
+    sweep_concurrency: int = Field(default=10, alias="ROTATION_SWEEP_CONCURRENCY")
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
@@ -47,6 +61,7 @@ class RotationTesterJobSettings(BaseSettings):
 class OpenRouterSettings(BaseSettings):
     rotation_retry_count: int = Field(alias="OPEN_ROUTER_ROTATION_RETRY_COUNT")
     http_call_retry_count: int = Field(alias="OPEN_ROUTER_HTTP_CALL_RETRY_COUNT")
+    base_url: str = Field(default="https://openrouter.ai/api/v1", alias="OPEN_ROUTER_BASE_URL")
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
@@ -54,6 +69,125 @@ class OpenRouterSettings(BaseSettings):
 class OpenAiSettings(BaseSettings):
     rotation_retry_count: int = Field(alias="OPEN_AI_ROTATION_RETRY_COUNT")
     http_call_retry_count: int = Field(alias="OPEN_AI_HTTP_CALL_RETRY_COUNT")
+    base_url: str = Field(default="https://api.openai.com/v1", alias="OPEN_AI_BASE_URL")
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+
+class TokenLeaseSettings(BaseSettings):
+    selection_strategy: TokenSelectionStrategy = Field(
+        default=TokenSelectionStrategy.HEALTH_WEIGHTED, alias="TOKEN_SELECTION_STRATEGY")
+    max_concurrency_per_token: int = Field(default=4, alias="TOKEN_MAX_CONCURRENCY")
+    lease_timeout_seconds: float = Field(default=30.0, alias="TOKEN_LEASE_TIMEOUT_SECONDS")
+    rate_limit_reserve: int = Field(default=1, alias="TOKEN_RATE_LIMIT_RESERVE")
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+
+class TokenHealthSettings(BaseSettings):
+    ewma_alpha: float = Field(default=0.1, alias="TOKEN_HEALTH_EWMA_ALPHA")
+    # A token lasting this long between its unlock and the next 429 gets half the score on that account.
+    reference_time_to_rate_limit_seconds: float = Field(
+        default=60.0, alias="TOKEN_HEALTH_REFERENCE_TIME_TO_RATE_LIMIT_SECONDS")
+    min_score: float = Field(default=0.05, alias="TOKEN_HEALTH_MIN_SCORE")
+    quarantine_success_ratio_threshold: float = Field(default=0.2, alias="TOKEN_QUARANTINE_SUCCESS_RATIO_THRESHOLD")
+    quarantine_min_observations: int = Field(default=20, alias="TOKEN_QUARANTINE_MIN_OBSERVATIONS")
+    quarantine_seconds: float = Field(default=3600.0, alias="TOKEN_QUARANTINE_SECONDS")
+    persist_cron: str = Field(default="* * * * *", alias="TOKEN_HEALTH_PERSIST_CRON")
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+
+class AiResultCacheSettings(BaseSettings):
+    ttl_seconds: float = Field(default=7 * 24 * 3600.0, alias="AI_RESULT_CACHE_TTL_SECONDS")
+    memory_max_size: int = Field(default=1000, alias="AI_RESULT_CACHE_MEMORY_SIZE")
+    db_max_rows: int = Field(default=100_000, alias="AI_RESULT_CACHE_DB_MAX_ROWS")
+    purge_cron: str = Field(default="*/30 * * * *", alias="AI_RESULT_CACHE_PURGE_CRON")
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+
+class AiBatchSettings(BaseSettings):
+    concurrency: int = Field(default=8, alias="AI_BATCH_CONCURRENCY")
+    max_events: int = Field(default=1000, alias="AI_BATCH_MAX_EVENTS")
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+
+class AiJobsSettings(BaseSettings):
+    workers: int = Field(default=4, alias="AI_JOBS_WORKERS")
+    poll_interval_seconds: float = Field(default=1.0, alias="AI_JOBS_POLL_INTERVAL_SECONDS")
+    visibility_timeout_seconds: float = Field(default=900.0, alias="AI_JOBS_VISIBILITY_TIMEOUT_SECONDS")
+    max_attempts: int = Field(default=3, alias="AI_JOBS_MAX_ATTEMPTS")
+    # Postponement of the jobs hitting upstream pressure: the least one, and the one with no better estimate.
+    retry_delay_seconds: float = Field(default=60.0, alias="AI_JOBS_RETRY_DELAY_SECONDS")
+    max_postponements: int = Field(default=30, alias="AI_JOBS_MAX_POSTPONEMENTS")
+    callback_timeout_seconds: float = Field(default=10.0, alias="AI_JOBS_CALLBACK_TIMEOUT_SECONDS")
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+
+class AiApiErrorsWriterSettings(BaseSettings):
+    queue_size: int = Field(default=10_000, alias="AI_API_ERRORS_QUEUE_SIZE")
+    batch_size: int = Field(default=500, alias="AI_API_ERRORS_BATCH_SIZE")
+    flush_interval_seconds: float = Field(default=1.0, alias="AI_API_ERRORS_FLUSH_INTERVAL_SECONDS")
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+
+class CircuitBreakerSettings(BaseSettings):
+    enabled: bool = Field(default=True, alias="CIRCUIT_BREAKER_ENABLED")
+    failure_threshold: int = Field(default=5, alias="CIRCUIT_BREAKER_FAILURE_THRESHOLD")
+    open_seconds: float = Field(default=30.0, alias="CIRCUIT_BREAKER_OPEN_SECONDS")
+    half_open_max_calls: int = Field(default=1, alias="CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS")
+    # Retry-After of the calls rejected while the probes are running.
+    half_open_retry_after_seconds: float = Field(default=5.0, alias="CIRCUIT_BREAKER_HALF_OPEN_RETRY_AFTER_SECONDS")
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+
+class AiRoutingSettings(BaseSettings):
+    # JSON list of {"api_provider", "model"}, tried in order after the requested route.
+    fallback_chain: List[AiRoute] = Field(default_factory=list, alias="AI_FALLBACK_CHAIN")
+    hedge_quantile: float = Field(default=0.95, alias="AI_HEDGE_QUANTILE")
+    hedge_min_samples: int = Field(default=20, alias="AI_HEDGE_MIN_SAMPLES")
+    latency_window_size: int = Field(default=200, alias="AI_LATENCY_WINDOW_SIZE")
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+
+def _default_auto_models() -> List[AiRoute]:
+    return [AiRoute(api_provider=ApiProvider.OPEN_ROUTER, model=model) for model in (
+        "deepseek/deepseek-r1:free",
+        "meta-llama/llama-4-scout:free",
+        "qwen/qwen3-4b:free",
+        "microsoft/mai-ds-r1:free",
+        "deepseek/deepseek-r1-0528-qwen3-8b:free")]
+
+
+class AiModelSelectionSettings(BaseSettings):
+    # JSON list of {"api_provider", "model"} the "auto" model is chosen from.
+    models: List[AiRoute] = Field(default_factory=_default_auto_models, alias="AI_AUTO_MODELS")
+    ewma_alpha: float = Field(default=0.2, alias="AI_MODEL_SELECTION_EWMA_ALPHA")
+    exploration_rate: float = Field(default=0.1, alias="AI_MODEL_SELECTION_EXPLORATION_RATE")
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+
+class RequestTimingSettings(BaseSettings):
+    server_timing_enabled: bool = Field(default=True, alias="SERVER_TIMING_ENABLED")
+    slow_request_threshold_seconds: float = Field(default=10.0, alias="SLOW_REQUEST_THRESHOLD_SECONDS")
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+
+class HttpClientSettings(BaseSettings):
+    timeout_seconds: float = Field(default=60.0, alias="HTTP_CLIENT_TIMEOUT_SECONDS")
+    connect_timeout_seconds: float = Field(default=10.0, alias="HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS")
+    max_connections: int = Field(default=100, alias="HTTP_CLIENT_MAX_CONNECTIONS")
+    max_keepalive_connections: int = Field(default=20, alias="HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS")
+    keepalive_expiry_seconds: float = Field(default=120.0, alias="HTTP_CLIENT_KEEPALIVE_EXPIRY_SECONDS")
+    http2_enabled: bool = Field(default=True, alias="HTTP_CLIENT_HTTP2_ENABLED")
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
@@ -63,10 +197,24 @@ class Settings(BaseSettings):
 
     postgres: PostgresSettings = Field(default_factory=PostgresSettings)
     token_encryption: TokenEncryptionSettings = Field(default_factory=TokenEncryptionSettings)
+    token_decryption_cache: TokenDecryptionCacheSettings = Field(default_factory=TokenDecryptionCacheSettings)
 
     open_router_settings: OpenRouterSettings = Field(default_factory=OpenRouterSettings)
     open_ai_settings: OpenAiSettings = Field(default_factory=OpenAiSettings)
 
+    http_client: HttpClientSettings = Field(default_factory=HttpClientSettings)
+    circuit_breaker: CircuitBreakerSettings = Field(default_factory=CircuitBreakerSettings)
+    ai_routing: AiRoutingSettings = Field(default_factory=AiRoutingSettings)
+    ai_model_selection: AiModelSelectionSettings = Field(default_factory=AiModelSelectionSettings)
+    request_timing: RequestTimingSettings = Field(default_factory=RequestTimingSettings)
+    ai_result_cache: AiResultCacheSettings = Field(default_factory=AiResultCacheSettings)
+    ai_batch: AiBatchSettings = Field(default_factory=AiBatchSettings)
+    ai_jobs: AiJobsSettings = Field(default_factory=AiJobsSettings)
+    ai_api_errors_writer: AiApiErrorsWriterSettings = Field(default_factory=AiApiErrorsWriterSettings)
+
+    token_lease: TokenLeaseSettings = Field(default_factory=TokenLeaseSettings)
+    token_health: TokenHealthSettings = Field(default_factory=TokenHealthSettings)
+
     rotation: RotationJobSettings = Field(default_factory=RotationJobSettings)
     rotation_tester: RotationTesterJobSettings = Field(default_factory=RotationTesterJobSettings)
 
@@ -6,6 +6,14 @@ import asyncpg
 from src.config.settings import settings
 from src.database.migration.migration_script_001 import migration_001_create_ai_tokens_table
 from src.database.migration.migration_script_002 import migration_002_create_ai_api_errors_table
+from src.database.migration.migration_script_003 import migration_003_create_tokens_changes_trigger
+from src.database.migration.migration_script_004 import migration_004_add_tokens_unlock_at
+from src.database.migration.migration_script_005 import migration_005_create_ai_results_cache_table
+from src.database.migration.migration_script_006 import migration_006_create_ai_processing_jobs_table
+from src.database.migration.migration_script_007 import migration_007_create_token_health_stats_table
+from src.database.migration.migration_script_008 import migration_008_add_tokens_lock_state_indexes
+from src.database.migration.migration_script_009 import migration_009_add_ai_processing_jobs_claims
+from src.database.migration.migration_script_010 import migration_010_add_ai_processing_jobs_postponements
 from src.util.logger import get_logger
 
 logger = get_logger(__name__)
@@ -36,7 +44,15 @@ class MigrationManager:
         """Register all migrations."""
         self.migrations = [
             Migration(1, "create_ai_tokens_table", migration_001_create_ai_tokens_table),
-            Migration(2, "create_ai_api_errors_table", migration_002_create_ai_api_errors_table)
+            Migration(2, "create_ai_api_errors_table", migration_002_create_ai_api_errors_table),
+            Migration(3, "create_tokens_changes_trigger", migration_003_create_tokens_changes_trigger),
+            Migration(4, "add_tokens_unlock_at", migration_004_add_tokens_unlock_at),
+            Migration(5, "create_ai_results_cache_table", migration_005_create_ai_results_cache_table),
+            Migration(6, "create_ai_processing_jobs_table", migration_006_create_ai_processing_jobs_table),
+            Migration(7, "create_token_health_stats_table", migration_007_create_token_health_stats_table),
+            Migration(8, "add_tokens_lock_state_indexes", migration_008_add_tokens_lock_state_indexes),
+            Migration(9, "add_ai_processing_jobs_claims", migration_009_add_ai_processing_jobs_claims),
+            Migration(10, "add_ai_processing_jobs_postponements", migration_010_add_ai_processing_jobs_postponements)
         ]
         # Sort by version
         self.migrations.sort(key=lambda m: m.version)
@@ -0,0 +1,36 @@
+import asyncpg
+
+
+async def migration_003_create_tokens_changes_trigger(conn: asyncpg.Connection) -> None:
+
+    """Publish every change of the tokens table to the 'tokens_changes' channel."""
+    await conn.execute("""
+        CREATE OR REPLACE FUNCTION notify_tokens_changes() RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                PERFORM pg_notify('tokens_changes', json_build_object(
+                    'operation', TG_OP,
+                    'id', OLD.id,
+                    'api_provider', OLD.api_provider)::text);
+            ELSE
+                PERFORM pg_notify('tokens_changes', json_build_object(
+                    'operation', TG_OP,
+                    'id', NEW.id,
+                    'api_provider', NEW.api_provider,
+                    'token_encrypted', NEW.token_encrypted,
+                    'locked', NEW.locked_at IS NOT NULL)::text);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    await conn.execute("""
+        DROP TRIGGER IF EXISTS tokens_changes_trigger ON tokens
+    """)
+
+    await conn.execute("""
+        CREATE TRIGGER tokens_changes_trigger
+        AFTER INSERT OR UPDATE OR DELETE ON tokens
+        FOR EACH ROW EXECUTE FUNCTION notify_tokens_changes()
+    """)
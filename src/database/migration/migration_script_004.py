@@ -0,0 +1,31 @@
+import asyncpg
+
+
+async def migration_004_add_tokens_unlock_at(conn: asyncpg.Connection) -> None:
+
+    """Add the expected recovery time of a locked token and publish it with the tokens changes."""
+    await conn.execute("""
+        ALTER TABLE tokens ADD COLUMN IF NOT EXISTS unlock_at TIMESTAMP WITH TIME ZONE
+    """)
+
+    await conn.execute("""
+        CREATE OR REPLACE FUNCTION notify_tokens_changes() RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                PERFORM pg_notify('tokens_changes', json_build_object(
+                    'operation', TG_OP,
+                    'id', OLD.id,
+                    'api_provider', OLD.api_provider)::text);
+            ELSE
+                PERFORM pg_notify('tokens_changes', json_build_object(
+                    'operation', TG_OP,
+                    'id', NEW.id,
+                    'api_provider', NEW.api_provider,
+                    'token_encrypted', NEW.token_encrypted,
+                    'locked', NEW.locked_at IS NOT NULL,
+                    'unlock_at', EXTRACT(EPOCH FROM NEW.unlock_at))::text);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
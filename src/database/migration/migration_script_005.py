@@ -0,0 +1,20 @@
+import asyncpg
+
+
+async def migration_005_create_ai_results_cache_table(conn: asyncpg.Connection) -> None:
+
+    """Create the ai_results_cache table."""
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS ai_results_cache (
+            cache_key TEXT PRIMARY KEY,
+            api_provider TEXT NOT NULL,
+            ai_model TEXT NOT NULL,
+            result JSONB NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+            expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+        )
+    """)
+
+    await conn.execute("""
+        CREATE INDEX IF NOT EXISTS ai_results_cache_expires_at_idx ON ai_results_cache (expires_at)
+    """)
@@ -0,0 +1,29 @@
+import asyncpg
+
+
+async def migration_006_create_ai_processing_jobs_table(conn: asyncpg.Connection) -> None:
+
+    """Create the ai_processing_jobs table."""
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS ai_processing_jobs (
+            id BIGSERIAL PRIMARY KEY,
+            api_provider TEXT NOT NULL,
+            ai_model TEXT NOT NULL,
+            raw_event TEXT NOT NULL,
+            bypass_cache BOOLEAN NOT NULL DEFAULT FALSE,
+            callback_url TEXT,
+            status TEXT NOT NULL DEFAULT 'PENDING',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            result JSONB,
+            error_text TEXT,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+            started_at TIMESTAMP WITH TIME ZONE,
+            finished_at TIMESTAMP WITH TIME ZONE
+        )
+    """)
+
+    await conn.execute("""
+        CREATE INDEX IF NOT EXISTS ai_processing_jobs_claimable_idx
+        ON ai_processing_jobs (created_at)
+        WHERE status IN ('PENDING', 'RUNNING')
+    """)
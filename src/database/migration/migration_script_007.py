@@ -0,0 +1,20 @@
+import asyncpg
+
+
+async def migration_007_create_token_health_stats_table(conn: asyncpg.Connection) -> None:
+
+    """Create the token_health_stats table, the per-token rolling stats persisted across restarts."""
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS token_health_stats (
+            token_id INTEGER PRIMARY KEY REFERENCES tokens (id) ON DELETE CASCADE,
+            success_ratio DOUBLE PRECISION NOT NULL,
+            latency_seconds DOUBLE PRECISION,
+            time_to_rate_limit_seconds DOUBLE PRECISION,
+            successes BIGINT NOT NULL DEFAULT 0,
+            rate_limits BIGINT NOT NULL DEFAULT 0,
+            errors BIGINT NOT NULL DEFAULT 0,
+            observations INTEGER NOT NULL DEFAULT 0,
+            quarantines INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+        )
+    """)
@@ -0,0 +1,18 @@
+import asyncpg
+
+
+async def migration_008_add_tokens_lock_state_indexes(conn: asyncpg.Connection) -> None:
+
+    """Index the non-locked and the locked tokens apart, so neither selection scans the whole tokens table."""
+    # Built concurrently, the tokens stay leasable and lockable meanwhile on a large table.
+    await conn.execute("""
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS tokens_non_locked_idx
+        ON tokens (api_provider, id)
+        WHERE locked_at IS NULL
+    """)
+
+    await conn.execute("""
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS tokens_locked_idx
+        ON tokens (unlock_at)
+        WHERE locked_at IS NOT NULL
+    """)
@@ -0,0 +1,11 @@
+import asyncpg
+
+
+async def migration_009_add_ai_processing_jobs_claims(conn: asyncpg.Connection) -> None:
+
+    """Add the claim counter fencing the stale workers off, and the time a released job gets claimable again."""
+    await conn.execute("""
+        ALTER TABLE ai_processing_jobs
+            ADD COLUMN IF NOT EXISTS claims INTEGER NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS not_before TIMESTAMP WITH TIME ZONE
+    """)
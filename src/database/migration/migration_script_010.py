@@ -0,0 +1,10 @@
+import asyncpg
+
+
+async def migration_010_add_ai_processing_jobs_postponements(conn: asyncpg.Connection) -> None:
+
+    """Add the count of the times a job has been put back to the queue because of upstream pressure."""
+    await conn.execute("""
+        ALTER TABLE ai_processing_jobs
+            ADD COLUMN IF NOT EXISTS postponements INTEGER NOT NULL DEFAULT 0
+    """)
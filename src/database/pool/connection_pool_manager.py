@@ -1,9 +1,13 @@
-from typing import Optional
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
 
 import asyncpg
 from asyncpg import Pool
 
 from src.config.settings import settings
+from src.metrics.metrics import DB_POOL_ACQUIRE_DURATION
+from src.util.request_timing import record_stage
 from src.util.logger import get_logger
 
 
@@ -32,8 +36,34 @@ class ConnectionPoolManager:
             logger.error("Failed to connect to PostgreSQL.", error=str(e))
             raise
 
-    def acquire_connection(self):
-        return self._pool.acquire()
+    @asynccontextmanager
+    async def acquire_connection(self) -> AsyncIterator[asyncpg.Connection]:
+        started_at = time.perf_counter()
+        async with self._pool.acquire() as conn:
+            acquired_at = time.perf_counter()
+            DB_POOL_ACQUIRE_DURATION.observe(acquired_at - started_at)
+            record_stage("db_pool_wait", acquired_at - started_at)
+            try:
+                yield conn
+            finally:
+                record_stage("db", time.perf_counter() - acquired_at)
+
+    def get_stats(self) -> Optional[Dict[str, Any]]:
+        if self._pool is None:
+            return None
+        return {
+            'size': self._pool.get_size(),
+            'idle': self._pool.get_idle_size(),
+            'max_size': self._pool.get_max_size(),
+        }
+
+    async def create_dedicated_connection(self) -> asyncpg.Connection:
+        """Open a connection outside the pool, e.g. for long-living LISTEN subscriptions."""
+        return await asyncpg.connect(
+            self._connection_string,
+            server_settings={
+                'application_name': f"uopp-data-processor-events-listener"
+            })
 
     async def disconnect(self) -> None:
         """Close the connection pool."""
@@ -1,3 +1,4 @@
+import math
 from typing import Any
 
 from fastapi.responses import JSONResponse
@@ -12,10 +13,11 @@ class NotFoundTokenException(Exception):
 
 
 class RotatableException(Exception):
-    def __init__(self, http_response_json: Any, inner: Exception | None = None):
+    def __init__(self, http_response_json: Any, inner: Exception | None = None, unlock_at: float | None = None):
         super().__init__()
         self.http_response_json = http_response_json
         self.inner = inner
+        self.unlock_at = unlock_at
 
     def __str__(self):
         if self.inner:
@@ -28,6 +30,34 @@ class AiHttpCallRetryableException(RotatableException):
         super().__init__(data, inner)
 
 
+class AiUpstreamFailureException(AiHttpCallRetryableException):
+    """5xx answer or no answer at all: the upstream is failing, not the token."""
+    pass
+
+
+class CircuitOpenException(Exception):
+    def __init__(self, api_provider: Any, model: str, retry_after: float):
+        super().__init__()
+        self.api_provider = api_provider
+        self.model = model
+        self.retry_after = retry_after
+
+    def __str__(self):
+        return f"Circuit of {self.api_provider} model '{self.model}' is open, retry in {self.retry_after:.1f}s"
+
+
+class InvalidAiOutputException(Exception):
+    def __init__(self, output: Any, inner: Exception | None = None):
+        super().__init__()
+        self.output = output
+        self.inner = inner
+
+    def __str__(self):
+        if self.inner:
+            return f"AI output is not a valid event (caused by {repr(self.inner)})"
+        return "AI output is not a valid event"
+
+
 async def internal_exception_handler(request, response):
     return JSONResponse(
         status_code=500,
@@ -50,3 +80,16 @@ async def not_found_token_exception_handler(request, response):
     return JSONResponse(
         status_code=500,
         content={"error": "Either API token is absent or all of them are locked."})
+
+
+async def invalid_ai_output_exception_handler(request, response):
+    return JSONResponse(
+        status_code=502,
+        content={"error": "AI model kept returning output that does not match the event schema."})
+
+
+async def circuit_open_exception_handler(request, exception: CircuitOpenException):
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": str(max(math.ceil(exception.retry_after), 1))},
+        content={"error": f"AI model '{exception.model}' is failing upstream, requests are paused."})
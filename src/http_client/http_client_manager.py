@@ -0,0 +1,86 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+import httpx
+
+from src.config.settings import settings, HttpClientSettings
+from src.model.api_provider import ApiProvider
+from src.util.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class HttpClientManager:
+    """Holds one long-living HTTP client (and so one connection pool) per API provider."""
+
+    def __init__(self, base_urls: Dict[ApiProvider, str], http_client_settings: HttpClientSettings) -> None:
+        self._base_urls = base_urls
+        self._settings = http_client_settings
+        self._clients: Dict[ApiProvider, httpx.AsyncClient] = {}
+        self._transports: Dict[ApiProvider, httpx.AsyncHTTPTransport] = {}
+
+    async def connect(self) -> None:
+        """Create the clients and open the first connection to every provider upfront."""
+        for api_provider, base_url in self._base_urls.items():
+            transport = httpx.AsyncHTTPTransport(
+                http2=self._settings.http2_enabled,
+                limits=httpx.Limits(
+                    max_connections=self._settings.max_connections,
+                    max_keepalive_connections=self._settings.max_keepalive_connections,
+                    keepalive_expiry=self._settings.keepalive_expiry_seconds))
+
+            self._transports[api_provider] = transport
+            self._clients[api_provider] = httpx.AsyncClient(
+                base_url=base_url,
+                transport=transport,
+                timeout=httpx.Timeout(
+                    self._settings.timeout_seconds,
+                    connect=self._settings.connect_timeout_seconds))
+
+        await asyncio.gather(*(self._warm_up(api_provider) for api_provider in self._clients))
+        logger.info("HTTP clients created", stats=self.get_stats())
+
+    def get_client(self, api_provider: ApiProvider) -> httpx.AsyncClient:
+        client: Optional[httpx.AsyncClient] = self._clients.get(api_provider)
+        if client is None:
+            raise RuntimeError(f"HTTP client for {api_provider} is not created, call connect() first.")
+        return client
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        stats: Dict[str, Dict[str, Any]] = {}
+        for api_provider, transport in self._transports.items():
+            # httpx does not expose the pool of its transport publicly.
+            connections = getattr(getattr(transport, "_pool", None), "connections", [])
+            idle = sum(1 for connection in connections if connection.is_idle())
+            stats[api_provider.value] = {
+                'connections': len(connections),
+                'active': len(connections) - idle,
+                'idle': idle,
+                'http2': sum(1 for connection in connections if "HTTP/2" in connection.info()),
+                'max_connections': self._settings.max_connections,
+                'max_keepalive_connections': self._settings.max_keepalive_connections,
+            }
+        return stats
+
+    async def disconnect(self) -> None:
+        """Close all the clients along with their connections."""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+        self._transports.clear()
+        logger.info("HTTP clients closed")
+
+    async def _warm_up(self, api_provider: ApiProvider) -> None:
+        # Any response will do, the goal is to have the TCP+TLS handshake done before the first real call.
+        try:
+            await self._clients[api_provider].get("/models")
+        except httpx.HTTPError as e:
+            logger.warning(f"Failed to warm up HTTP client for {api_provider}.", error=str(e))
+
+
+http_client_manager_instance = HttpClientManager(
+    base_urls={
+        ApiProvider.OPEN_ROUTER: settings.open_router_settings.base_url,
+        ApiProvider.OPEN_AI: settings.open_ai_settings.base_url,
+    },
+    http_client_settings=settings.http_client)
@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Dict, Any, Callable
 
 from src.model.api_provider import ApiProvider
 from src.model.api_token import ApiToken
@@ -16,3 +16,17 @@ def map_api_token_dict_to_api_token(api_token_dict: Dict[str, Any], token_value:
         token_id=api_token_dict['id'],
         api_provider=ApiProvider(api_token_dict['api_provider']),
         value=token_value)
+
+
+def map_api_token_dict_to_lazy_api_token(api_token_dict: Dict[str, Any], decrypt: Callable[[], str]) -> ApiToken:
+    return ApiToken(
+        token_id=api_token_dict['id'],
+        api_provider=ApiProvider(api_token_dict['api_provider']),
+        decrypt=decrypt)
+
+
+def map_api_token_to_dict(api_token: ApiToken) -> Dict[str, Any]:
+    return {
+        'token_id': api_token.token_id,
+        'api_provider': api_token.api_provider,
+        'value': api_token.value}
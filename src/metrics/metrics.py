@@ -0,0 +1,78 @@
+import functools
+import time
+from typing import Awaitable, Callable
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Upstream AI calls.
+AI_UPSTREAM_REQUESTS = Counter(
+    "ai_upstream_requests_total", "Upstream chat completion calls.", ["provider", "model", "status"])
+AI_UPSTREAM_REQUEST_DURATION = Histogram(
+    "ai_upstream_request_duration_seconds", "Duration of the upstream chat completion calls.", ["provider", "model"],
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120))
+AI_RATE_LIMITED = Counter(
+    "ai_rate_limited_total", "Upstream calls answered with a rate limit error.", ["provider"])
+AI_HTTP_CALL_RETRIES = Counter(
+    "ai_http_call_retries_total", "Upstream calls retried with the same token.", ["provider"])
+AI_INVALID_OUTPUTS = Counter(
+    "ai_invalid_outputs_total", "Model outputs not repairable into a valid event.", ["provider", "model"])
+AI_RESULT_CACHE_LOOKUPS = Counter(
+    "ai_result_cache_lookups_total", "Result cache lookups.", ["provider", "result"])
+AI_FAILOVERS = Counter(
+    "ai_failovers_total", "Requests moved on to the next route of the fallback chain.", ["provider", "model"])
+AI_HEDGED_REQUESTS = Counter(
+    "ai_hedged_requests_total", "Hedged second requests fired, by the request that answered first.", ["winner"])
+AI_MODEL_SELECTIONS = Counter(
+    "ai_model_selections_total", "Models chosen for the auto model, by the way they were chosen.",
+    ["provider", "model", "choice"])
+AI_CIRCUIT_STATE = Gauge(
+    "ai_circuit_state", "Circuit breaker state per model: 0 closed, 1 half-open, 2 open.", ["provider", "model"])
+AI_CIRCUIT_REJECTIONS = Counter(
+    "ai_circuit_rejections_total", "Requests failed fast on an open circuit.", ["provider", "model"])
+
+# Token rotation.
+ROTATION_ATTEMPTS = Counter(
+    "rotation_attempts_total", "Attempts under token rotation, by outcome.", ["service", "outcome"])
+ROTATION_RETRIES = Counter(
+    "rotation_retries_total", "Attempts retried with another token after a rotation.", ["service"])
+TOKEN_LEASE_WAIT = Histogram(
+    "token_lease_wait_seconds", "Time spent waiting for a token lease.", ["provider"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1, 5, 15, 30))
+TOKEN_LEASE_TIMEOUTS = Counter(
+    "token_lease_timeouts_total", "Leases given up because all the tokens stayed busy or paused.", ["provider"])
+TOKEN_LOCKS = Counter("token_locks_total", "Tokens locked.")
+TOKEN_UNLOCKS = Counter("token_unlocks_total", "Tokens unlocked.")
+TOKEN_QUARANTINES = Counter("token_quarantines_total", "Chronically failing tokens locked for the quarantine.")
+# Refreshed by the unlock job, the live non-locked counts are collected at scrape time.
+TOKENS_LOCKED = Gauge("tokens_locked", "Locked tokens as of the last unlock job run.", ["provider"])
+
+# DB pool.
+DB_POOL_ACQUIRE_DURATION = Histogram(
+    "db_pool_acquire_duration_seconds", "Time spent waiting for a pooled DB connection.",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5))
+
+# Scheduled jobs.
+SCHEDULED_JOB_RUNS = Counter(
+    "scheduled_job_runs_total", "Scheduled job runs, by outcome.", ["job", "outcome"])
+SCHEDULED_JOB_DURATION = Histogram(
+    "scheduled_job_duration_seconds", "Duration of the scheduled job runs.", ["job"],
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 300))
+
+
+def track_job(job_name: str):
+    """Decorate a scheduled job to count its runs and time them."""
+    def decorator(job: Callable[[], Awaitable[None]]) -> Callable[[], Awaitable[None]]:
+        @functools.wraps(job)
+        async def wrapper() -> None:
+            started_at = time.perf_counter()
+            outcome = "success"
+            try:
+                await job()
+            except Exception:
+                outcome = "error"
+                raise
+            finally:
+                SCHEDULED_JOB_DURATION.labels(job_name).observe(time.perf_counter() - started_at)
+                SCHEDULED_JOB_RUNS.labels(job_name, outcome).inc()
+        return wrapper
+    return decorator
@@ -0,0 +1,48 @@
+from typing import Any, Dict, Iterator, Optional
+
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+from prometheus_client.registry import Collector
+
+from src.database.pool.connection_pool_manager import ConnectionPoolManager, connection_pool_manager_instance
+from src.model.api_provider import ApiProvider
+from src.service.ai.ai_api_errors_writer import AiApiErrorsWriter, ai_api_errors_writer
+from src.service.rotation.token_service import TokenService, token_service
+
+
+class StateCollector(Collector):
+    """Reads the in-memory state of the service at scrape time, so nothing has to be kept in sync for it."""
+
+    def __init__(self, token_service: TokenService, connection_pool_manager: ConnectionPoolManager,
+                 ai_api_errors_writer: AiApiErrorsWriter) -> None:
+        self._token_service = token_service
+        self._connection_pool_manager = connection_pool_manager
+        self._ai_api_errors_writer = ai_api_errors_writer
+
+    def collect(self) -> Iterator[Metric]:
+        available = GaugeMetricFamily("tokens_available", "Non-locked tokens in the registry.", labels=["provider"])
+        in_flight = GaugeMetricFamily("token_leases_in_flight", "Token leases held by requests.", labels=["provider"])
+        for api_provider in ApiProvider:
+            available.add_metric([api_provider.value], self._token_service.count_available(api_provider))
+            in_flight.add_metric([api_provider.value], self._token_service.count_in_flight(api_provider))
+        yield available
+        yield in_flight
+        yield GaugeMetricFamily(
+            "token_unlocks_scheduled", "Locked tokens waiting for their scheduled unlock.",
+            value=self._token_service.count_scheduled_unlocks())
+
+        pool_stats: Optional[Dict[str, Any]] = self._connection_pool_manager.get_stats()
+        if pool_stats is not None:
+            yield GaugeMetricFamily("db_pool_size", "Open pooled DB connections.", value=pool_stats['size'])
+            yield GaugeMetricFamily("db_pool_idle", "Idle pooled DB connections.", value=pool_stats['idle'])
+            yield GaugeMetricFamily("db_pool_max_size", "Pooled DB connections limit.", value=pool_stats['max_size'])
+
+        writer_stats: Dict[str, Any] = self._ai_api_errors_writer.get_stats()
+        yield GaugeMetricFamily(
+            "ai_api_errors_queued", "AI API errors waiting to be saved.", value=writer_stats['queued'])
+        yield CounterMetricFamily(
+            "ai_api_errors_dropped", "AI API errors dropped on a full queue.", value=writer_stats['dropped'])
+        yield CounterMetricFamily(
+            "ai_api_errors_failed", "AI API errors lost on a failed write.", value=writer_stats['failed'])
+
+
+state_collector = StateCollector(token_service, connection_pool_manager_instance, ai_api_errors_writer)
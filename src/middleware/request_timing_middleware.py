@@ -0,0 +1,49 @@
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.config.settings import RequestTimingSettings
+from src.util.logger import get_logger
+from src.util.request_timing import RequestTimings, start_request_timings
+
+logger = get_logger(__name__)
+
+
+class RequestTimingMiddleware:
+    """Times the stages of every HTTP request, reports them in the Server-Timing header and logs the slow requests.
+
+    The header carries the stages done before the response starts; for the streamed responses,
+    the rest of the stages shows up in the slow request log only.
+    """
+
+    def __init__(self, app: ASGIApp, request_timing_settings: RequestTimingSettings) -> None:
+        self._app = app
+        self._settings = request_timing_settings
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self._app(scope, receive, send)
+            return
+
+        timings: RequestTimings = start_request_timings()
+        status_code: int = 500
+
+        async def send_with_server_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self._settings.server_timing_enabled:
+                    MutableHeaders(scope=message).append("Server-Timing", timings.to_server_timing())
+            await send(message)
+
+        try:
+            await self._app(scope, receive, send_with_server_timing)
+        finally:
+            elapsed: float = timings.elapsed()
+            if elapsed >= self._settings.slow_request_threshold_seconds:
+                logger.warning(
+                    "Slow request.",
+                    method=scope["method"],
+                    path=scope["path"],
+                    status_code=status_code,
+                    duration_ms=round(elapsed * 1000, 1),
+                    stages=timings.to_log_dict())
@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class AiJobStatus(str, Enum):
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
@@ -0,0 +1,11 @@
+from pydantic import BaseModel, ConfigDict
+
+from src.model.api_provider import ApiProvider
+
+
+class AiRoute(BaseModel):
+    """A provider and model a request can be sent to."""
+    model_config = ConfigDict(frozen=True)
+
+    api_provider: ApiProvider
+    model: str
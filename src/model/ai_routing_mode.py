@@ -0,0 +1,10 @@
+from enum import Enum
+
+
+class AiRoutingMode(str, Enum):
+    # Only the requested provider and model.
+    DIRECT = "direct"
+    # Over the fallback chain, moving on when a route is unavailable.
+    FAILOVER = "failover"
+    # Failover, plus a second request down the chain once the first one runs slower than usual.
+    HEDGED = "hedged"
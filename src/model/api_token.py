@@ -1,9 +1,20 @@
+from typing import Callable, Optional
+
 from src.model.api_provider import ApiProvider
 
 
 class ApiToken:
 
-    def __init__(self, token_id: int, api_provider: ApiProvider, value: str) -> None:
+    def __init__(self, token_id: int, api_provider: ApiProvider, value: Optional[str] = None,
+                 decrypt: Optional[Callable[[], str]] = None) -> None:
         self.token_id: int = token_id
         self.api_provider: ApiProvider = api_provider
-        self.value: str = value
+        self._value: Optional[str] = value
+        self._decrypt: Optional[Callable[[], str]] = decrypt
+
+    @property
+    def value(self) -> str:
+        """Token value; a lazily loaded token gets decrypted on the first access only."""
+        if self._value is None:
+            self._value = self._decrypt()
+        return self._value
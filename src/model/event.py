@@ -1,7 +1,7 @@
-def create_system_message_prompt():
-    """Create a prompt for Ukrainian event extraction."""
+# Bump it whenever the prompts change, the results cached for the previous prompts get stale then.
+PROMPT_VERSION = "2"
 
-    system_prompt = """Ти - експерт з аналізу українських текстів та витягування структурованих даних про події.
+SYSTEM_PROMPT = """Ти - експерт з аналізу українських текстів та витягування структурованих даних про події.
 
 ВАЖЛИВО: ВСІ ПОЛЯ ПОВИННІ БУТИ ЗАПОВНЕНІ. НЕ ПОВЕРТАЙ null.
 
@@ -30,8 +30,8 @@ def create_system_message_prompt():
 
 Поверни тільки JSON без додаткового тексту."""
 
-    return { "role": "system", "content": system_prompt }
+USER_PROMPT_PREFIX = "Проаналізуй наступний текст та витягни інформацію про подію:\n\n"
 
-def create_user_message_prompt(text: str):
-    user_prompt = f"Проаналізуй наступний текст та витягни інформацію про подію:\n\n{text}"
-    return { "role": "user", "content": user_prompt }
+
+def create_user_prompt(text: str) -> str:
+    return USER_PROMPT_PREFIX + text
@@ -0,0 +1,10 @@
+from typing import Optional
+
+
+class RateLimitState:
+    """Rate-limit window of a token as reported by the provider's response headers."""
+
+    def __init__(self, limit: Optional[int], remaining: int, reset_at: float) -> None:
+        self.limit: Optional[int] = limit
+        self.remaining: int = remaining
+        self.reset_at: float = reset_at
@@ -0,0 +1,16 @@
+from typing import Optional
+
+from src.model.api_token import ApiToken
+
+
+class TokenLease:
+    """A token handed out to a single request, released once the request is done with it.
+
+    The epoch identifies the period during which the token stayed non-locked, so that
+    a late failure does not retire the token again after it has been unlocked meanwhile.
+    It is None for tokens picked directly from DB.
+    """
+
+    def __init__(self, api_token: ApiToken, epoch: Optional[int]) -> None:
+        self.api_token: ApiToken = api_token
+        self.epoch: Optional[int] = epoch
@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class TokenSelectionStrategy(str, Enum):
+    LEAST_LOADED = "least_loaded"
+    ROUND_ROBIN = "round_robin"
+    HEALTH_WEIGHTED = "health_weighted"
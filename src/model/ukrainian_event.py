@@ -1,7 +1,7 @@
 """Data models for Ukrainian event extraction."""
 
 from typing import List, Optional, Union, Dict
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, field_validator
 from enum import Enum
 
 
@@ -85,7 +85,8 @@ class UkrainianEvent(BaseModel):
     
 
     
-    @validator('price')
+    @field_validator('price')
+    @classmethod
     def validate_price(cls, v):
         """Validate price format."""
         if v is None:
@@ -99,14 +100,16 @@ class UkrainianEvent(BaseModel):
                 raise ValueError("Price must be numeric, 'free', or null")
         return v
     
-    @validator('title', pre=True)
+    @field_validator('title', mode='before')
+    @classmethod
     def validate_title(cls, v):
         """Validate and provide default for title."""
-        if v is None or not v or not v.strip():
-            raise ValueError("Title cannot be empty or null")
+        if not isinstance(v, str) or not v.strip():
+            raise ValueError("Title must be a non-empty string")
         return v.strip()
     
-    @validator('format', pre=True)
+    @field_validator('format', mode='before')
+    @classmethod
     def validate_format(cls, v):
         """Validate and provide default for format."""
         if v is None:
@@ -115,14 +118,37 @@ class UkrainianEvent(BaseModel):
             raise ValueError("Format must be 'offline' or 'online'")
         return v
     
-    @validator('categories', pre=True)
+    @field_validator('categories', mode='before')
+    @classmethod
     def validate_categories(cls, v):
         """Validate and provide default for categories."""
-        if v is None or not v or len(v) == 0:
-            raise ValueError("At least one category must be specified")
+        if not isinstance(v, list) or len(v) == 0:
+            raise ValueError("At least one category must be specified as a list")
         return v
 
 
+# Filled in by the geocoding afterwards, the model is not asked for them.
+_GEOCODING_FIELDS = ('coordinates', 'formatted_address', 'place_id', 'location_confidence')
+
+
+def _build_ukrainian_event_json_schema() -> dict:
+    schema: dict = UkrainianEvent.model_json_schema()
+    for field_name in _GEOCODING_FIELDS:
+        schema['properties'].pop(field_name)
+    return schema
+
+
+# Built once at import, sent as the response_format of every completion request.
+UKRAINIAN_EVENT_RESPONSE_FORMAT: dict = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "ukrainian_event",
+        "strict": False,
+        "schema": _build_ukrainian_event_json_schema(),
+    },
+}
+
+
 class OpenRouterMessage(BaseModel):
     """OpenRouter API message model."""
     
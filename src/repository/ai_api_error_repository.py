@@ -1,4 +1,5 @@
-from typing import Optional
+from datetime import datetime
+from typing import List, Tuple
 
 from src.database.pool.connection_pool_manager import connection_pool_manager_instance, ConnectionPoolManager
 
@@ -8,16 +9,11 @@ class AiApiErrorsRepository:
     def __init__(self, connection_pool_manager: ConnectionPoolManager) -> None:
         self._connection_pool_manager = connection_pool_manager
 
-    async def save_error(self, error_text: str, ai_model: str) -> Optional[int]:
-        query = """
-        INSERT INTO ai_api_errors (error_text, ai_model)
-        VALUES ($1, $2)
-        ON CONFLICT DO NOTHING
-        RETURNING id
-        """
+    async def save_errors(self, errors: List[Tuple[str, str, datetime]]) -> None:
+        """Save (error_text, ai_model, created_at) records with a single COPY."""
         async with self._connection_pool_manager.acquire_connection() as conn:
-            row = await conn.fetchrow(query, error_text, ai_model)
-            return row["id"] if row else None
+            await conn.copy_records_to_table(
+                "ai_api_errors", records=errors, columns=["error_text", "ai_model", "created_at"])
 
 
 ai_api_errors_repository = AiApiErrorsRepository(connection_pool_manager_instance)
@@ -0,0 +1,118 @@
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from src.database.pool.connection_pool_manager import connection_pool_manager_instance, ConnectionPoolManager
+from src.model.ai_job_status import AiJobStatus
+from src.model.api_provider import ApiProvider
+
+
+class AiJobRepository:
+
+    def __init__(self, connection_pool_manager: ConnectionPoolManager) -> None:
+        self._connection_pool_manager = connection_pool_manager
+
+    async def save_jobs(self, api_provider: ApiProvider, ai_model: str, raw_events: List[str],
+                        bypass_cache: bool, callback_url: Optional[str]) -> List[int]:
+        query = """
+        INSERT INTO ai_processing_jobs (api_provider, ai_model, raw_event, bypass_cache, callback_url)
+        SELECT $1, $2, raw_event, $4, $5
+        FROM unnest($3::text[]) WITH ORDINALITY AS events(raw_event, position)
+        ORDER BY position
+        RETURNING id
+        """
+        async with self._connection_pool_manager.acquire_connection() as conn:
+            rows = await conn.fetch(query, api_provider.value, ai_model, raw_events, bypass_cache, callback_url)
+            return [row["id"] for row in rows]
+
+    async def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        query = """
+         SELECT id, status, attempts, result, error_text, created_at, started_at, finished_at
+         FROM ai_processing_jobs
+         WHERE id = $1"""
+
+        async with self._connection_pool_manager.acquire_connection() as conn:
+            row = await conn.fetchrow(query, job_id)
+            if row is None:
+                return None
+            return {
+                'id': row['id'],
+                'status': AiJobStatus(row['status']),
+                'attempts': row['attempts'],
+                'result': json.loads(row['result']) if row['result'] is not None else None,
+                'error': row['error_text'],
+                'created_at': row['created_at'],
+                'started_at': row['started_at'],
+                'finished_at': row['finished_at']}
+
+    async def claim_job(self, visibility_timeout_seconds: float) -> Optional[Dict[str, Any]]:
+        """Claim the oldest pending job, or a running one whose worker has been silent for too long.
+
+        SKIP LOCKED lets the workers of all replicas claim concurrently without waiting for each other.
+        The returned claim number fences the job off the previous, stale workers of it.
+        """
+        query = """
+        UPDATE ai_processing_jobs
+        SET status = 'RUNNING', started_at = NOW(), attempts = attempts + 1, claims = claims + 1, not_before = NULL
+        WHERE id = (
+            SELECT id FROM ai_processing_jobs
+            WHERE (status = 'PENDING' AND (not_before IS NULL OR not_before <= NOW()))
+               OR (status = 'RUNNING' AND started_at < NOW() - make_interval(secs => $1))
+            ORDER BY created_at
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED)
+        RETURNING id, api_provider, ai_model, raw_event, bypass_cache, callback_url, attempts, claims, postponements
+        """
+        async with self._connection_pool_manager.acquire_connection() as conn:
+            row = await conn.fetchrow(query, visibility_timeout_seconds)
+            if row is None:
+                return None
+            return {
+                'id': row['id'],
+                'api_provider': ApiProvider(row['api_provider']),
+                'ai_model': row['ai_model'],
+                'raw_event': row['raw_event'],
+                'bypass_cache': row['bypass_cache'],
+                'callback_url': row['callback_url'],
+                'attempts': row['attempts'],
+                'claims': row['claims'],
+                'postponements': row['postponements']}
+
+    async def complete_job(self, job_id: int, claims: int, result: Any) -> bool:
+        """Store the result, unless the job has been claimed again since; returns whether it was stored."""
+        query = """
+        UPDATE ai_processing_jobs
+        SET status = 'DONE', result = $3::jsonb, error_text = NULL, finished_at = NOW()
+        WHERE id = $1 AND status = 'RUNNING' AND claims = $2
+        RETURNING id
+        """
+        async with self._connection_pool_manager.acquire_connection() as conn:
+            row = await conn.fetchrow(query, job_id, claims, json.dumps(result))
+            return row is not None
+
+    async def fail_job(self, job_id: int, claims: int, error_text: str) -> bool:
+        query = """
+        UPDATE ai_processing_jobs
+        SET status = 'FAILED', error_text = $3, finished_at = NOW()
+        WHERE id = $1 AND status = 'RUNNING' AND claims = $2
+        RETURNING id
+        """
+        async with self._connection_pool_manager.acquire_connection() as conn:
+            row = await conn.fetchrow(query, job_id, claims, error_text)
+            return row is not None
+
+    async def release_job(self, job_id: int, claims: int, not_before: datetime) -> bool:
+        """Put the job back to the queue from not_before on, giving back the attempt it has taken."""
+        query = """
+        UPDATE ai_processing_jobs
+        SET status = 'PENDING', attempts = attempts - 1, postponements = postponements + 1,
+            started_at = NULL, not_before = $3
+        WHERE id = $1 AND status = 'RUNNING' AND claims = $2
+        RETURNING id
+        """
+        async with self._connection_pool_manager.acquire_connection() as conn:
+            row = await conn.fetchrow(query, job_id, claims, not_before)
+            return row is not None
+
+
+ai_job_repository = AiJobRepository(connection_pool_manager_instance)
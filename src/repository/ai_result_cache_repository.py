@@ -0,0 +1,51 @@
+import json
+from typing import Any, Optional
+
+from src.database.pool.connection_pool_manager import connection_pool_manager_instance, ConnectionPoolManager
+from src.model.api_provider import ApiProvider
+
+
+class AiResultCacheRepository:
+
+    def __init__(self, connection_pool_manager: ConnectionPoolManager) -> None:
+        self._connection_pool_manager = connection_pool_manager
+
+    async def get_result(self, cache_key: str) -> Optional[Any]:
+        query = """
+         SELECT result
+         FROM ai_results_cache
+         WHERE cache_key = $1 AND expires_at > NOW()"""
+
+        async with self._connection_pool_manager.acquire_connection() as conn:
+            row = await conn.fetchrow(query, cache_key)
+            return json.loads(row["result"]) if row else None
+
+    async def save_result(self, cache_key: str, api_provider: ApiProvider, ai_model: str,
+                          result: Any, ttl_seconds: float) -> None:
+        query = """
+        INSERT INTO ai_results_cache (cache_key, api_provider, ai_model, result, expires_at)
+        VALUES ($1, $2, $3, $4::jsonb, NOW() + make_interval(secs => $5))
+        ON CONFLICT (cache_key) DO UPDATE
+        SET result = EXCLUDED.result, created_at = NOW(), expires_at = EXCLUDED.expires_at
+        """
+        async with self._connection_pool_manager.acquire_connection() as conn:
+            await conn.execute(query, cache_key, api_provider.value, ai_model, json.dumps(result), ttl_seconds)
+
+    async def delete_expired_and_oldest(self, max_rows: int) -> int:
+        """Delete the expired results, then the oldest ones above max_rows. Returns the number of deleted rows."""
+        delete_expired_query = "DELETE FROM ai_results_cache WHERE expires_at <= NOW()"
+        delete_oldest_query = """
+        DELETE FROM ai_results_cache
+        WHERE cache_key IN (
+            SELECT cache_key FROM ai_results_cache
+            ORDER BY created_at DESC
+            OFFSET $1)
+        """
+        async with self._connection_pool_manager.acquire_connection() as conn:
+            expired_status: str = await conn.execute(delete_expired_query)
+            oldest_status: str = await conn.execute(delete_oldest_query, max_rows)
+            # The status looks like 'DELETE <count>'.
+            return int(expired_status.split()[-1]) + int(oldest_status.split()[-1])
+
+
+ai_result_cache_repository = AiResultCacheRepository(connection_pool_manager_instance)
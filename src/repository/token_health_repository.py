@@ -0,0 +1,49 @@
+from typing import Any, Dict, List
+
+from src.database.pool.connection_pool_manager import connection_pool_manager_instance, ConnectionPoolManager
+
+
+class TokenHealthRepository:
+
+    def __init__(self, connection_pool_manager: ConnectionPoolManager) -> None:
+        self._connection_pool_manager = connection_pool_manager
+
+    async def get_all_stats(self) -> List[Dict[str, Any]]:
+        query = """
+         SELECT token_id, success_ratio, latency_seconds, time_to_rate_limit_seconds,
+                successes, rate_limits, errors, observations, quarantines
+         FROM token_health_stats"""
+
+        async with self._connection_pool_manager.acquire_connection() as conn:
+            rows = await conn.fetch(query)
+            return [dict(row) for row in rows]
+
+    async def save_stats(self, stats: List[Dict[str, Any]]) -> None:
+        """Upsert the stats with a single statement; the ones of the tokens deleted meanwhile are skipped."""
+        query = """
+        INSERT INTO token_health_stats (token_id, success_ratio, latency_seconds, time_to_rate_limit_seconds,
+                                        successes, rate_limits, errors, observations, quarantines)
+        SELECT s.*
+        FROM unnest($1::int[], $2::float8[], $3::float8[], $4::float8[],
+                    $5::bigint[], $6::bigint[], $7::bigint[], $8::int[], $9::int[])
+            AS s (token_id, success_ratio, latency_seconds, time_to_rate_limit_seconds,
+                  successes, rate_limits, errors, observations, quarantines)
+        JOIN tokens ON tokens.id = s.token_id
+        ON CONFLICT (token_id) DO UPDATE
+        SET success_ratio = EXCLUDED.success_ratio,
+            latency_seconds = EXCLUDED.latency_seconds,
+            time_to_rate_limit_seconds = EXCLUDED.time_to_rate_limit_seconds,
+            successes = EXCLUDED.successes,
+            rate_limits = EXCLUDED.rate_limits,
+            errors = EXCLUDED.errors,
+            observations = EXCLUDED.observations,
+            quarantines = EXCLUDED.quarantines,
+            updated_at = NOW()
+        """
+        columns = ('token_id', 'success_ratio', 'latency_seconds', 'time_to_rate_limit_seconds',
+                   'successes', 'rate_limits', 'errors', 'observations', 'quarantines')
+        async with self._connection_pool_manager.acquire_connection() as conn:
+            await conn.execute(query, *([row[column] for row in stats] for column in columns))
+
+
+token_health_repository = TokenHealthRepository(connection_pool_manager_instance)
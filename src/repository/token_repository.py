@@ -1,9 +1,15 @@
-from typing import Dict, Any, Optional, List
+import json
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Callable, Tuple
+
+import asyncpg
 
 from src.database.pool.connection_pool_manager import connection_pool_manager_instance, ConnectionPoolManager
 from src.mapping.api_token_mapper import map_db_row_to_api_token_dict
 from src.model.api_provider import ApiProvider
 
+TOKENS_CHANGES_CHANNEL = "tokens_changes"
+
 
 class TokenRepository:
 
@@ -21,17 +27,33 @@ class TokenRepository:
             return map_db_row_to_api_token_dict(row) if row else None
 
     async def get_random_non_locked_by_api_provider(self, api_provider: ApiProvider) -> Optional[Dict[str, Any]]:
+        # The first non-locked token from a random id between the lowest and the highest one on, instead of
+        # sorting all of them by RANDOM(): three descents of tokens_non_locked_idx. Tokens after gaps
+        # in the ids are picked more often, which is fine for a fallback while the registry is down.
         query = """
          SELECT id, api_provider, token_encrypted
          FROM tokens
-         WHERE api_provider = $1 AND locked_at IS NULL
-         ORDER BY RANDOM()
+         WHERE api_provider = $1 AND locked_at IS NULL AND id >= (
+             SELECT min(id) + floor(random() * (max(id) - min(id) + 1))::int
+             FROM tokens
+             WHERE api_provider = $1 AND locked_at IS NULL)
+         ORDER BY id
          LIMIT 1"""
 
         async with self._connection_pool_manager.acquire_connection() as conn:
             row = await conn.fetchrow(query, api_provider.value)
             return map_db_row_to_api_token_dict(row) if row else None
 
+    async def get_non_locked_tokens(self) -> List[Dict[str, Any]]:
+        query = """
+         SELECT id, api_provider, token_encrypted
+         FROM tokens
+         WHERE locked_at IS NULL"""
+
+        async with self._connection_pool_manager.acquire_connection() as conn:
+            rows = await conn.fetch(query)
+            return [map_db_row_to_api_token_dict(row) for row in rows]
+
     async def get_locked_tokens(self) -> List[Dict[str, Any]]:
         query = """
          SELECT id, api_provider, token_encrypted
@@ -42,6 +64,38 @@ class TokenRepository:
             rows = await conn.fetch(query)
             return [map_db_row_to_api_token_dict(row) for row in rows]
 
+    async def get_locked_tokens_due_for_check(self) -> List[Dict[str, Any]]:
+        """Locked tokens whose expected recovery time is unknown or already passed."""
+        query = """
+         SELECT id, api_provider, token_encrypted
+         FROM tokens
+         WHERE locked_at IS NOT NULL AND (unlock_at IS NULL OR unlock_at <= NOW())"""
+
+        async with self._connection_pool_manager.acquire_connection() as conn:
+            rows = await conn.fetch(query)
+            return [map_db_row_to_api_token_dict(row) for row in rows]
+
+    async def get_scheduled_unlocks(self) -> List[Tuple[int, ApiProvider, datetime]]:
+        query = """
+         SELECT id, api_provider, unlock_at
+         FROM tokens
+         WHERE locked_at IS NOT NULL AND unlock_at IS NOT NULL"""
+
+        async with self._connection_pool_manager.acquire_connection() as conn:
+            rows = await conn.fetch(query)
+            return [(row["id"], ApiProvider(row["api_provider"]), row["unlock_at"]) for row in rows]
+
+    async def count_locked_tokens(self) -> Dict[ApiProvider, int]:
+        query = """
+         SELECT api_provider, COUNT(*) AS locked_count
+         FROM tokens
+         WHERE locked_at IS NOT NULL
+         GROUP BY api_provider"""
+
+        async with self._connection_pool_manager.acquire_connection() as conn:
+            rows = await conn.fetch(query)
+            return {ApiProvider(row["api_provider"]): row["locked_count"] for row in rows}
+
     async def save_token(self, token_encrypted: str, token_hash: str, api_provider: ApiProvider) -> Optional[int]:
         query = """
         INSERT INTO tokens (token_encrypted, token_hash, api_provider)
@@ -53,21 +107,22 @@ class TokenRepository:
             row = await conn.fetchrow(query, token_encrypted, token_hash, api_provider.value)
             return row["id"] if row else None
 
-    async def lock_token(self, token_id: int) -> bool:
+    async def lock_token(self, token_id: int, unlock_at: Optional[datetime] = None) -> Optional[ApiProvider]:
+        """Lock the token, returns its provider, or None if it was already locked or does not exist."""
         query = """
         UPDATE tokens
-        SET locked_at = NOW()
+        SET locked_at = NOW(), unlock_at = $2
         WHERE id = $1 AND locked_at IS NULL
-        RETURNING id;
+        RETURNING id, api_provider;
         """
         async with self._connection_pool_manager.acquire_connection() as conn:
-            row = await conn.fetchrow(query, token_id)
-            return row is not None
+            row = await conn.fetchrow(query, token_id, unlock_at)
+            return ApiProvider(row["api_provider"]) if row is not None else None
 
     async def unlock_token(self, token_id: int) -> bool:
         query = """
         UPDATE tokens
-        SET locked_at = NULL
+        SET locked_at = NULL, unlock_at = NULL
         WHERE id = $1 AND locked_at IS NOT NULL
         RETURNING id;
         """
@@ -75,10 +130,39 @@ class TokenRepository:
             row = await conn.fetchrow(query, token_id)
             return row is not None
 
+    async def unlock_tokens(self, token_ids: List[int]) -> List[int]:
+        query = """
+        UPDATE tokens
+        SET locked_at = NULL, unlock_at = NULL
+        WHERE id = ANY($1::int[]) AND locked_at IS NOT NULL
+        RETURNING id;
+        """
+        async with self._connection_pool_manager.acquire_connection() as conn:
+            rows = await conn.fetch(query, token_ids)
+            return [row["id"] for row in rows]
+
     async def delete_token_by_id(self, token_id: int) -> None:
         query = "DELETE FROM tokens WHERE id = $1"
         async with self._connection_pool_manager.acquire_connection() as conn:
             await conn.execute(query, token_id)
 
+    async def listen_changes(self, on_change: Callable[[Dict[str, Any]], None],
+                             on_termination: Callable[[], None]) -> asyncpg.Connection:
+        """Subscribe to the NOTIFY events published by the tokens table trigger.
+
+        The subscription holds its own connection, so it does not occupy a slot of the pool.
+        """
+        def notification_callback(connection, pid, channel, payload) -> None:
+            on_change(json.loads(payload))
+
+        conn = await self._connection_pool_manager.create_dedicated_connection()
+        conn.add_termination_listener(lambda connection: on_termination())
+        await conn.add_listener(TOKENS_CHANGES_CHANNEL, notification_callback)
+        return conn
+
+    async def stop_listening(self, conn: asyncpg.Connection) -> None:
+        if not conn.is_closed():
+            await conn.close()
+
 
 token_repository = TokenRepository(connection_pool_manager_instance)
@@ -1,27 +1,109 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
+import json
+from typing import AsyncIterator, List, Optional
 
+from fastapi import APIRouter, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field
+from starlette import status
+
+from src.config.settings import settings
+from src.model.ai_route import AiRoute
+from src.model.ai_routing_mode import AiRoutingMode
 from src.model.api_provider import ApiProvider
+from src.service.ai.ai_batch_processor import ai_batch_processor
+from src.service.ai.ai_job_service import ai_job_service
 from src.service.ai.ai_processor_service import AiProcessorService
-from src.service.ai.impl.open_ai_processor_service import open_ai_processor_service
-from src.service.ai.impl.open_router_processor_service import open_router_processor_service
+from src.service.ai.ai_processors import ai_processors_map
+from src.service.ai.ai_routing_service import ai_routing_service
+from src.service.ai.ai_stream import AiStream
 
 router = APIRouter()
 
 
 class RequestBody(BaseModel):
     api_provider: ApiProvider
+    # A model name, or "auto" to have it chosen from the configured models by their live statistics.
     model: str
     raw_event: str
+    bypass_cache: bool = False
+    stream: bool = False
+    routing: AiRoutingMode = AiRoutingMode.DIRECT
+    # Routes tried after the requested one, the configured fallback chain if not given.
+    fallbacks: Optional[List[AiRoute]] = None
+
 
+class BatchRequestBody(BaseModel):
+    api_provider: ApiProvider
+    model: str
+    raw_events: List[str] = Field(min_length=1, max_length=settings.ai_batch.max_events)
+    bypass_cache: bool = False
 
-ai_processors_map: dict[ApiProvider, AiProcessorService] = {
-    ApiProvider.OPEN_AI: open_ai_processor_service,
-    ApiProvider.OPEN_ROUTER: open_router_processor_service
-}
+
+class JobsRequestBody(BaseModel):
+    api_provider: ApiProvider
+    model: str
+    raw_events: List[str] = Field(min_length=1, max_length=settings.ai_batch.max_events)
+    bypass_cache: bool = False
+    callback_url: Optional[str] = None
 
 
 @router.post("/ai/processing")
 async def process_event_by_ai(body: RequestBody):
+    if body.routing != AiRoutingMode.DIRECT:
+        return await _process_event_by_routing(body)
+
     service: AiProcessorService = ai_processors_map.get(body.api_provider)
-    return await service.process(body.model, body.raw_event)
+    if body.stream:
+        # Opened before the response starts, so the rotation errors still map to the regular error responses.
+        return _stream_response(await service.stream(body.model, body.raw_event))
+
+    return await service.process(body.model, body.raw_event, body.bypass_cache)
+
+
+async def _process_event_by_routing(body: RequestBody):
+    chain: List[AiRoute] = ai_routing_service.build_chain(
+        AiRoute(api_provider=body.api_provider, model=body.model), body.fallbacks)
+    if body.stream:
+        # Streamed requests are failed over while the stream is opened, they are never hedged.
+        return _stream_response(await ai_routing_service.stream(chain, body.raw_event))
+
+    return await ai_routing_service.process(
+        chain, body.raw_event, body.bypass_cache, hedged=body.routing == AiRoutingMode.HEDGED)
+
+
+def _stream_response(stream: AiStream) -> StreamingResponse:
+    # Closed by the background task as well, the iteration never starts if the client leaves before the first chunk.
+    return StreamingResponse(stream, media_type="text/event-stream", headers={"Cache-Control": "no-cache"},
+                             background=BackgroundTask(stream.aclose))
+
+
+@router.post("/ai/processing/batch")
+async def process_events_batch_by_ai(body: BatchRequestBody):
+    service: AiProcessorService = ai_processors_map.get(body.api_provider)
+
+    async def ndjson_lines() -> AsyncIterator[str]:
+        async for item in ai_batch_processor.process(service, body.model, body.raw_events, body.bypass_cache):
+            yield json.dumps(jsonable_encoder(item), ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
+@router.post("/ai/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_ai_jobs(body: JobsRequestBody):
+    job_ids: List[int] = await ai_job_service.submit(
+        body.api_provider, body.model, body.raw_events, body.bypass_cache, body.callback_url)
+    return {'job_ids': job_ids}
+
+
+@router.get("/ai/jobs/{job_id}")
+async def get_ai_job(job_id: int):
+    job = await ai_job_service.get(job_id)
+
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found")
+
+    return job
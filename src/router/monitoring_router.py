@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from src.http_client.http_client_manager import http_client_manager_instance
+from src.service.ai.ai_api_errors_writer import ai_api_errors_writer
+from src.service.ai.ai_circuit_breaker import ai_circuit_breaker
+from src.service.ai.ai_model_selector import ai_model_selector
+from src.service.rotation.token_health_tracker import token_health_tracker
+
+router = APIRouter()
+
+
+@router.get("/monitoring/http-pools")
+async def get_http_pools_stats():
+    return http_client_manager_instance.get_stats()
+
+
+@router.get("/monitoring/ai-api-errors-writer")
+async def get_ai_api_errors_writer_stats():
+    return ai_api_errors_writer.get_stats()
+
+
+@router.get("/monitoring/circuit-breakers")
+async def get_circuit_breakers_stats():
+    return ai_circuit_breaker.get_stats()
+
+
+@router.get("/monitoring/model-selector")
+async def get_model_selector_stats():
+    return ai_model_selector.get_stats()
+
+
+@router.get("/monitoring/token-health")
+async def get_token_health_stats(limit: int = 50):
+    return token_health_tracker.get_stats(limit)
+
+
+@router.get("/metrics")
+async def get_metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
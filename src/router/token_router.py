@@ -4,6 +4,7 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from starlette import status
 
+from src.mapping.api_token_mapper import map_api_token_to_dict
 from src.model.api_provider import ApiProvider
 from src.service.rotation.rate_checking.impl.open_router_rate_limit_checker import open_router_rate_limit_checker
 from src.service.rotation.token_service import token_service
@@ -27,21 +28,21 @@ class TokenRotationDto(BaseModel):
 @router.get("/tokens/random")
 async def get_token(api_provider: ApiProvider):
     token = await token_service.get_random_by_api_provider(api_provider=api_provider)
-    return token
+    return map_api_token_to_dict(token) if token else None
 
 
 # ToDo: 03/10 For testing only, delete it.
 @router.get("/tokens/locked")
 async def get_locked_token():
     locked_token = await token_service.get_locked_tokens()
-    return locked_token
+    return [map_api_token_to_dict(token) for token in locked_token]
 
 
 # ToDo: 01/10 For testing only, delete it.
 @router.get("/tokens/{token_id}")
 async def get_token_by_id(token_id: int):
     token = await token_service.get_by_id(token_id)
-    return token
+    return map_api_token_to_dict(token) if token else None
 
 
 @router.get("/tokens/open-router/rate-limit-check")
@@ -84,6 +85,6 @@ async def unlock_token(token_id: int):
 
 
 @router.delete("/tokens/{token_id}")
-async def delete_token(token_id: str):
+async def delete_token(token_id: int):
     await token_service.delete(token_id)
     return 'Deleted, if found.'
@@ -0,0 +1,100 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config.settings import settings, AiApiErrorsWriterSettings
+from src.repository.ai_api_error_repository import AiApiErrorsRepository, ai_api_errors_repository
+from src.util.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class AiApiErrorsWriter:
+    """Write-behind buffer of the upstream errors, so a failed call never waits for a DB write.
+
+    Errors are queued in memory and saved in batches by a background task. The queue is bounded;
+    when it is full, e.g. the DB is down during a 429 storm, the new errors are dropped and counted.
+    """
+
+    def __init__(self, repository: AiApiErrorsRepository, ai_api_errors_writer_settings: AiApiErrorsWriterSettings):
+        self._repository = repository
+        self._settings = ai_api_errors_writer_settings
+        self._queue: asyncio.Queue[Tuple[str, str, datetime]] = asyncio.Queue(
+            maxsize=ai_api_errors_writer_settings.queue_size)
+        self._task: Optional[asyncio.Task] = None
+        self._write_task: Optional[asyncio.Task] = None
+        self._gathering: List[Tuple[str, str, datetime]] = []
+        self._written_count: int = 0
+        self._dropped_count: int = 0
+        self._failed_count: int = 0
+        self._dropped_since_report: int = 0
+
+    def record(self, error_text: str, ai_model: str) -> None:
+        try:
+            self._queue.put_nowait((error_text, ai_model, datetime.now(timezone.utc)))
+        except asyncio.QueueFull:
+            self._dropped_count += 1
+            self._dropped_since_report += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'queued': self._queue.qsize(),
+            'written': self._written_count,
+            'dropped': self._dropped_count,
+            'failed': self._failed_count,
+        }
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and flush all the errors still queued."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        if self._write_task is not None:
+            await self._write_task
+
+        # The errors already taken from the queue while the next batch was being gathered go first.
+        errors, self._gathering = self._gathering, []
+        while errors or not self._queue.empty():
+            await self._write(self._take_batch(errors))
+            errors = []
+
+    async def _run(self) -> None:
+        while True:
+            self._gathering = [await self._queue.get()]
+            if self._queue.qsize() < self._settings.batch_size - 1:
+                # Lets a burst of errors gather into a single write.
+                await asyncio.sleep(self._settings.flush_interval_seconds)
+
+            errors, self._gathering = self._take_batch(self._gathering), []
+            # Shielded, so that stopping the writer does not interrupt a batch in the middle of its write.
+            self._write_task = asyncio.ensure_future(self._write(errors))
+            await asyncio.shield(self._write_task)
+            self._write_task = None
+
+    def _take_batch(self, errors: List[Tuple[str, str, datetime]]) -> List[Tuple[str, str, datetime]]:
+        while len(errors) < self._settings.batch_size and not self._queue.empty():
+            errors.append(self._queue.get_nowait())
+        return errors
+
+    async def _write(self, errors: List[Tuple[str, str, datetime]]) -> None:
+        try:
+            await self._repository.save_errors(errors)
+            self._written_count += len(errors)
+        except Exception as e:
+            self._failed_count += len(errors)
+            logger.error(f"Failed to save {len(errors)} AI API errors.", error=str(e))
+
+        if self._dropped_since_report:
+            logger.warning(f"AI API errors queue was full, {self._dropped_since_report} errors dropped.")
+            self._dropped_since_report = 0
+
+
+ai_api_errors_writer = AiApiErrorsWriter(ai_api_errors_repository, settings.ai_api_errors_writer)
@@ -0,0 +1,46 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, List
+
+from src.config.settings import settings, AiBatchSettings
+from src.service.ai.ai_processor_service import AiProcessorService
+from src.util.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class AiBatchProcessor:
+    """Processes a batch of raw events with bounded concurrency, yielding every result once it is ready."""
+
+    def __init__(self, ai_batch_settings: AiBatchSettings) -> None:
+        self._settings = ai_batch_settings
+
+    async def process(self, service: AiProcessorService, model: str, raw_events: List[str],
+                      bypass_cache: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """Yield {'index', 'result'} or {'index', 'error'} per event, in the order of completion.
+
+        A failed event is reported in its own item and does not stop the rest of the batch.
+        """
+        semaphore = asyncio.Semaphore(self._settings.concurrency)
+
+        async def process_one(index: int, raw_event: str) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    result = await service.process(model, raw_event, bypass_cache)
+                    return {'index': index, 'result': result}
+                except Exception as e:
+                    logger.warning(f"Failed to process raw_event #{index} of the batch, exception: '{e}'")
+                    return {'index': index, 'error': f"{type(e).__name__}: {e}"}
+
+        tasks: List[asyncio.Task] = [
+            asyncio.ensure_future(process_one(index, raw_event)) for index, raw_event in enumerate(raw_events)]
+        try:
+            for completed in asyncio.as_completed(tasks):
+                yield await completed
+        finally:
+            # The client may go away in the middle of the batch, the rest of it is not needed then. The calls
+            # already in flight get cancelled upstream as well, unless an identical request still waits on them.
+            for task in tasks:
+                task.cancel()
+
+
+ai_batch_processor = AiBatchProcessor(settings.ai_batch)
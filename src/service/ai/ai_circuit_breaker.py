@@ -0,0 +1,142 @@
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.config.settings import settings, CircuitBreakerSettings
+from src.exception.exception_handler import CircuitOpenException
+from src.metrics.metrics import AI_CIRCUIT_STATE, AI_CIRCUIT_REJECTIONS
+from src.model.api_provider import ApiProvider
+from src.model.circuit_state import CircuitState
+from src.util.logger import get_logger
+
+logger = get_logger(__name__)
+
+_STATE_GAUGE_VALUES: Dict[CircuitState, int] = {
+    CircuitState.CLOSED: 0, CircuitState.HALF_OPEN: 1, CircuitState.OPEN: 2}
+
+
+class _Circuit:
+
+    def __init__(self) -> None:
+        self.state: CircuitState = CircuitState.CLOSED
+        self.consecutive_failures: int = 0
+        self.opened_until: float = 0.0
+        self.probes_in_flight: int = 0
+
+
+class AiCircuitBreaker:
+    """Circuit breaker per (provider, model) in front of the upstream calls.
+
+    After failure_threshold consecutive upstream failures (5xx or no answer) the circuit opens and the calls
+    fail fast for open_seconds. Then up to half_open_max_calls probe calls are let through: a success closes
+    the circuit, a failure opens it again. Every permitted call must end with exactly one of
+    record_success, record_failure or release.
+    """
+
+    def __init__(self, circuit_breaker_settings: CircuitBreakerSettings,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self._settings = circuit_breaker_settings
+        self._clock = clock
+        self._circuits: Dict[Tuple[ApiProvider, str], _Circuit] = {}
+
+    def check(self, api_provider: ApiProvider, model: str) -> None:
+        """Fail fast if the circuit would not let a call through, without taking a probe slot.
+
+        Meant to run before leasing a token, so a call bound to be rejected does not hold one.
+        """
+        if not self._settings.enabled:
+            return
+
+        circuit: Optional[_Circuit] = self._circuits.get((api_provider, model))
+        if circuit is None:
+            return
+        if circuit.state == CircuitState.OPEN:
+            retry_after: float = circuit.opened_until - self._clock()
+            if retry_after > 0:
+                self._reject(api_provider, model, retry_after)
+        elif circuit.state == CircuitState.HALF_OPEN and circuit.probes_in_flight >= self._settings.half_open_max_calls:
+            self._reject(api_provider, model, self._settings.half_open_retry_after_seconds)
+
+    def is_open(self, api_provider: ApiProvider, model: str) -> bool:
+        if not self._settings.enabled:
+            return False
+
+        circuit: Optional[_Circuit] = self._circuits.get((api_provider, model))
+        return circuit is not None and circuit.state == CircuitState.OPEN and circuit.opened_until > self._clock()
+
+    def acquire(self, api_provider: ApiProvider, model: str) -> None:
+        """Permit a single upstream call, raises CircuitOpenException if the circuit does not let it through."""
+        if not self._settings.enabled:
+            return
+
+        circuit: _Circuit = self._circuits.setdefault((api_provider, model), _Circuit())
+        if circuit.state == CircuitState.OPEN:
+            retry_after: float = circuit.opened_until - self._clock()
+            if retry_after > 0:
+                self._reject(api_provider, model, retry_after)
+            self._transition(api_provider, model, circuit, CircuitState.HALF_OPEN)
+
+        if circuit.state == CircuitState.HALF_OPEN:
+            if circuit.probes_in_flight >= self._settings.half_open_max_calls:
+                # The probes are still running, their outcome is to be known shortly.
+                self._reject(api_provider, model, self._settings.half_open_retry_after_seconds)
+            circuit.probes_in_flight += 1
+
+    def record_success(self, api_provider: ApiProvider, model: str) -> None:
+        circuit: Optional[_Circuit] = self._end_call(api_provider, model)
+        if circuit is None:
+            return
+
+        circuit.consecutive_failures = 0
+        if circuit.state == CircuitState.HALF_OPEN:
+            self._transition(api_provider, model, circuit, CircuitState.CLOSED)
+
+    def record_failure(self, api_provider: ApiProvider, model: str) -> None:
+        circuit: Optional[_Circuit] = self._end_call(api_provider, model)
+        if circuit is None:
+            return
+
+        circuit.consecutive_failures += 1
+        if circuit.state == CircuitState.HALF_OPEN or (
+                circuit.state == CircuitState.CLOSED
+                and circuit.consecutive_failures >= self._settings.failure_threshold):
+            circuit.opened_until = self._clock() + self._settings.open_seconds
+            self._transition(api_provider, model, circuit, CircuitState.OPEN)
+
+    def release(self, api_provider: ApiProvider, model: str) -> None:
+        """End a permitted call that told nothing about the upstream health, e.g. a cancelled one."""
+        self._end_call(api_provider, model)
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        now: float = self._clock()
+        return [
+            {'api_provider': api_provider, 'model': model, 'state': circuit.state,
+             'consecutive_failures': circuit.consecutive_failures,
+             'retry_after_seconds': max(circuit.opened_until - now, 0.0) if circuit.state == CircuitState.OPEN else 0.0}
+            for (api_provider, model), circuit in self._circuits.items()]
+
+    def _end_call(self, api_provider: ApiProvider, model: str) -> Optional[_Circuit]:
+        if not self._settings.enabled:
+            return None
+
+        circuit: Optional[_Circuit] = self._circuits.get((api_provider, model))
+        if circuit is not None and circuit.state == CircuitState.HALF_OPEN and circuit.probes_in_flight > 0:
+            circuit.probes_in_flight -= 1
+        return circuit
+
+    def _transition(self, api_provider: ApiProvider, model: str, circuit: _Circuit, state: CircuitState) -> None:
+        circuit.state = state
+        circuit.probes_in_flight = 0
+        AI_CIRCUIT_STATE.labels(api_provider.value, model).set(_STATE_GAUGE_VALUES[state])
+        if state == CircuitState.OPEN:
+            logger.warning(f"Circuit of {api_provider} model '{model}' opened for {self._settings.open_seconds}s "
+                           f"after {circuit.consecutive_failures} consecutive upstream failures.")
+        else:
+            logger.info(f"Circuit of {api_provider} model '{model}' is {state.value}.")
+
+    @staticmethod
+    def _reject(api_provider: ApiProvider, model: str, retry_after: float) -> None:
+        AI_CIRCUIT_REJECTIONS.labels(api_provider.value, model).inc()
+        raise CircuitOpenException(api_provider, model, retry_after)
+
+
+ai_circuit_breaker = AiCircuitBreaker(settings.circuit_breaker)
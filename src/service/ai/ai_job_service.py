@@ -0,0 +1,163 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+
+from src.config.settings import settings, AiJobsSettings
+from src.exception.exception_handler import CircuitOpenException, NotFoundTokenException, RotatableException, \
+    AiUpstreamFailureException
+from src.model.ai_job_status import AiJobStatus
+from src.model.api_provider import ApiProvider
+from src.repository.ai_job_repository import AiJobRepository, ai_job_repository
+from src.service.ai.ai_processor_service import AiProcessorService
+from src.service.ai.ai_processors import ai_processors_map
+from src.service.rotation.token_service import TokenService, token_service
+from src.util.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class AiJobService:
+    """Asynchronous processing of the raw events through the ai_processing_jobs queue.
+
+    Submitting only stores the jobs; the workers of every replica claim them one by one, process them
+    through the regular AI processors and store the result, optionally posting it to the callback URL.
+    Jobs hitting upstream pressure (rate limit, open circuit, no token left, failing upstream) go back
+    to the queue until it is expected to ease, without using up their attempts, up to max_postponements times.
+    """
+
+    def __init__(self, repository: AiJobRepository, processors: Dict[ApiProvider, AiProcessorService],
+                 token_service: TokenService, ai_jobs_settings: AiJobsSettings) -> None:
+        self._repository = repository
+        self._processors = processors
+        self._token_service = token_service
+        self._settings = ai_jobs_settings
+        self._new_jobs = asyncio.Event()
+        self._workers: List[asyncio.Task] = []
+        self._callback_client: Optional[httpx.AsyncClient] = None
+
+    async def submit(self, api_provider: ApiProvider, model: str, raw_events: List[str],
+                     bypass_cache: bool = False, callback_url: Optional[str] = None) -> List[int]:
+        job_ids: List[int] = await self._repository.save_jobs(api_provider, model, raw_events, bypass_cache, callback_url)
+        # The local workers start right away, the other replicas pick the jobs up on their next poll.
+        self._new_jobs.set()
+        return job_ids
+
+    async def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        return await self._repository.get_job(job_id)
+
+    def start(self) -> None:
+        self._callback_client = httpx.AsyncClient(timeout=self._settings.callback_timeout_seconds)
+        self._workers = [
+            asyncio.get_running_loop().create_task(self._work(worker_index))
+            for worker_index in range(self._settings.workers)]
+        logger.info(f"AI jobs workers started ({self._settings.workers} workers).")
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        if self._callback_client is not None:
+            await self._callback_client.aclose()
+            self._callback_client = None
+
+    async def _work(self, worker_index: int) -> None:
+        while True:
+            try:
+                job: Optional[Dict[str, Any]] = await self._repository.claim_job(
+                    self._settings.visibility_timeout_seconds)
+            except Exception as e:
+                logger.error(f"AI jobs worker #{worker_index} failed to claim a job.", error=str(e))
+                job = None
+
+            if job is None:
+                self._new_jobs.clear()
+                try:
+                    await asyncio.wait_for(self._new_jobs.wait(), self._settings.poll_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._run(job)
+            except Exception as e:
+                # The job stays running and is claimed again once its visibility timeout is over.
+                logger.error(f"AI jobs worker #{worker_index} failed to run job (id={job['id']}).", error=str(e))
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id: int = job['id']
+        if job['attempts'] > self._settings.max_attempts:
+            # Claimed again after its worker went silent too many times, e.g. the replica kept crashing on it.
+            await self._fail(job, f"Gave up after {self._settings.max_attempts} attempts.")
+            return
+
+        try:
+            service: AiProcessorService = self._processors[job['api_provider']]
+            result = jsonable_encoder(await service.process(job['ai_model'], job['raw_event'], job['bypass_cache']))
+        except Exception as e:
+            if _is_upstream_pressure(e) and job['postponements'] < self._settings.max_postponements:
+                await self._postpone(job, e)
+                return
+            logger.warning(f"AI job (id={job_id}) failed, exception: '{e}'")
+            await self._fail(job, f"{type(e).__name__}: {e}")
+            return
+
+        if not await self._repository.complete_job(job_id, job['claims'], result):
+            logger.warning(f"AI job (id={job_id}) was claimed again meanwhile, its result is dropped.")
+            return
+        await self._send_callback(job, {'id': job_id, 'status': AiJobStatus.DONE, 'result': result})
+
+    async def _postpone(self, job: Dict[str, Any], e: Exception) -> None:
+        """Not the job's fault: it goes back to the queue, claimable once the upstream pressure is expected to ease."""
+        delay_seconds: float = self._get_retry_delay(job['api_provider'], e)
+        logger.warning(f"AI job (id={job['id']}) postponed by {delay_seconds:.1f}s, exception: '{e}'")
+        not_before = datetime.now(timezone.utc) + timedelta(seconds=delay_seconds)
+        if not await self._repository.release_job(job['id'], job['claims'], not_before):
+            logger.warning(f"AI job (id={job['id']}) was claimed again meanwhile, not postponed.")
+
+    def _get_retry_delay(self, api_provider: ApiProvider, e: Exception) -> float:
+        # Never shorter than the setting, so the workers do not spin on claiming and releasing the same jobs.
+        min_delay_seconds: float = self._settings.retry_delay_seconds
+        if isinstance(e, CircuitOpenException):
+            return max(e.retry_after, min_delay_seconds)
+        if not isinstance(e, AiUpstreamFailureException) and self._token_service.count_available(api_provider) == 0:
+            # Every token of the provider is locked: back once the first of them is due to unlock.
+            next_unlock_at: Optional[float] = self._token_service.next_unlock_at(api_provider)
+            if next_unlock_at is not None:
+                return max(next_unlock_at - time.time(), min_delay_seconds)
+        return min_delay_seconds
+
+    async def _fail(self, job: Dict[str, Any], error_text: str) -> None:
+        if not await self._repository.fail_job(job['id'], job['claims'], error_text):
+            logger.warning(f"AI job (id={job['id']}) was claimed again meanwhile, not failed.")
+            return
+        await self._send_callback(job, {'id': job['id'], 'status': AiJobStatus.FAILED, 'error': error_text})
+
+    async def _send_callback(self, job: Dict[str, Any], payload: Dict[str, Any]) -> None:
+        if not job['callback_url']:
+            return
+
+        try:
+            response = await self._callback_client.post(job['callback_url'], json=jsonable_encoder(payload))
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            # The result stays available for polling, the callback is not retried.
+            logger.warning(f"Failed to call back for AI job (id={job['id']}).", error=str(e))
+
+
+def _is_upstream_pressure(e: Exception) -> bool:
+    """Whether the job failed because of the upstream capacity, not because of the request itself.
+
+    A 429 comes as a bare RotatableException; its AiHttpCallRetryableException subclass is every other
+    4xx answer, e.g. an unknown model, which no postponement would fix.
+    """
+    return (isinstance(e, (CircuitOpenException, NotFoundTokenException, AiUpstreamFailureException))
+            or type(e) is RotatableException)
+
+
+ai_job_service = AiJobService(ai_job_repository, ai_processors_map, token_service, settings.ai_jobs)
@@ -0,0 +1,31 @@
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from src.config.settings import settings, AiRoutingSettings
+from src.model.api_provider import ApiProvider
+
+
+class AiLatencyTracker:
+    """Latency of the recent upstream-served requests per (provider, model), over a fixed-size window."""
+
+    def __init__(self, ai_routing_settings: AiRoutingSettings) -> None:
+        self._settings = ai_routing_settings
+        self._windows: Dict[Tuple[ApiProvider, str], Deque[float]] = {}
+
+    def observe(self, api_provider: ApiProvider, model: str, seconds: float) -> None:
+        window: Optional[Deque[float]] = self._windows.get((api_provider, model))
+        if window is None:
+            window = self._windows[(api_provider, model)] = deque(maxlen=self._settings.latency_window_size)
+        window.append(seconds)
+
+    def quantile(self, api_provider: ApiProvider, model: str, q: float) -> Optional[float]:
+        """The q-quantile of the window, None until it holds hedge_min_samples observations."""
+        window: Optional[Deque[float]] = self._windows.get((api_provider, model))
+        if window is None or len(window) < self._settings.hedge_min_samples:
+            return None
+
+        ordered = sorted(window)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+ai_latency_tracker = AiLatencyTracker(settings.ai_routing)
@@ -0,0 +1,115 @@
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config.settings import settings, AiModelSelectionSettings
+from src.metrics.metrics import AI_MODEL_SELECTIONS
+from src.model.ai_route import AiRoute
+from src.model.api_provider import ApiProvider
+from src.service.ai.ai_circuit_breaker import AiCircuitBreaker, ai_circuit_breaker
+
+AUTO_MODEL = "auto"
+
+
+class _ModelStats:
+
+    def __init__(self) -> None:
+        self.latency_seconds: Optional[float] = None
+        self.rate_limited_ratio: float = 0.0
+        self.success_ratio: float = 1.0
+        self.observations: int = 0
+
+
+class AiModelSelector:
+    """Chooses the model behind the "auto" model out of the configured set, from live upstream statistics.
+
+    Every model keeps the EWMAs of its latency, of the share of 429 answers and of the share of answers
+    parsed into a valid event. An epsilon-greedy policy picks the model with the best expected valid events
+    per second of latency, and a random one with the exploration rate, so the throttled or slowed down
+    models get re-checked. Models never observed yet are tried first, models with an open circuit are skipped.
+    """
+
+    def __init__(self, ai_model_selection_settings: AiModelSelectionSettings, circuit_breaker: AiCircuitBreaker,
+                 rng: Optional[random.Random] = None) -> None:
+        self._settings = ai_model_selection_settings
+        self._circuit_breaker = circuit_breaker
+        self._rng = rng if rng is not None else random.Random()
+        self._stats: Dict[Tuple[ApiProvider, str], _ModelStats] = {
+            (route.api_provider, route.model): _ModelStats() for route in ai_model_selection_settings.models}
+
+    def choose(self, api_provider: ApiProvider) -> Optional[AiRoute]:
+        """A model of the provider to send the next request to, None if the provider has none configured."""
+        candidates: List[AiRoute] = [route for route in self._settings.models if route.api_provider == api_provider]
+        if not candidates:
+            return None
+
+        # With all the circuits open the request fails fast anyway, whichever model it goes to.
+        closed: List[AiRoute] = [
+            route for route in candidates if not self._circuit_breaker.is_open(route.api_provider, route.model)]
+        candidates = closed or candidates
+
+        unobserved: List[AiRoute] = [route for route in candidates if self._get_stats(route).observations == 0]
+        if unobserved:
+            return self._chosen(self._rng.choice(unobserved), "explore")
+        if self._rng.random() < self._settings.exploration_rate:
+            return self._chosen(self._rng.choice(candidates), "explore")
+
+        worst_latency: float = max(self._get_stats(route).latency_seconds or 0.0 for route in candidates) or 1.0
+        scores: Dict[AiRoute, float] = {route: self._score(route, worst_latency) for route in candidates}
+        best_score: float = max(scores.values())
+        return self._chosen(self._rng.choice([route for route in candidates if scores[route] == best_score]), "exploit")
+
+    def record_success(self, api_provider: ApiProvider, model: str, latency_seconds: float) -> None:
+        stats: Optional[_ModelStats] = self._stats.get((api_provider, model))
+        if stats is None:
+            return
+
+        stats.latency_seconds = latency_seconds if stats.latency_seconds is None \
+            else self._ewma(stats.latency_seconds, latency_seconds)
+        stats.success_ratio = self._ewma(stats.success_ratio, 1.0)
+        stats.rate_limited_ratio = self._ewma(stats.rate_limited_ratio, 0.0)
+        stats.observations += 1
+
+    def record_failure(self, api_provider: ApiProvider, model: str) -> None:
+        """An answer that is not a valid event, or no answer at all."""
+        stats: Optional[_ModelStats] = self._stats.get((api_provider, model))
+        if stats is None:
+            return
+
+        stats.success_ratio = self._ewma(stats.success_ratio, 0.0)
+        stats.rate_limited_ratio = self._ewma(stats.rate_limited_ratio, 0.0)
+        stats.observations += 1
+
+    def record_rate_limited(self, api_provider: ApiProvider, model: str) -> None:
+        stats: Optional[_ModelStats] = self._stats.get((api_provider, model))
+        if stats is None:
+            return
+
+        stats.rate_limited_ratio = self._ewma(stats.rate_limited_ratio, 1.0)
+        stats.observations += 1
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        return [
+            {'api_provider': api_provider, 'model': model, 'latency_seconds': stats.latency_seconds,
+             'rate_limited_ratio': round(stats.rate_limited_ratio, 4), 'success_ratio': round(stats.success_ratio, 4),
+             'observations': stats.observations}
+            for (api_provider, model), stats in self._stats.items()]
+
+    def _get_stats(self, route: AiRoute) -> _ModelStats:
+        return self._stats[(route.api_provider, route.model)]
+
+    def _score(self, route: AiRoute, worst_latency: float) -> float:
+        stats: _ModelStats = self._get_stats(route)
+        # Models without a single success yet are taken as slow as the slowest one.
+        latency: float = stats.latency_seconds or worst_latency
+        return stats.success_ratio * (1.0 - stats.rate_limited_ratio) / max(latency, 1e-3)
+
+    def _ewma(self, average: float, value: float) -> float:
+        return average + self._settings.ewma_alpha * (value - average)
+
+    @staticmethod
+    def _chosen(route: AiRoute, choice: str) -> AiRoute:
+        AI_MODEL_SELECTIONS.labels(route.api_provider.value, route.model, choice).inc()
+        return route
+
+
+ai_model_selector = AiModelSelector(settings.ai_model_selection, ai_circuit_breaker)
@@ -0,0 +1,42 @@
+import json
+from typing import Any
+
+from src.model.event import SYSTEM_PROMPT, create_user_prompt
+from src.model.ukrainian_event import UKRAINIAN_EVENT_RESPONSE_FORMAT
+
+_MAX_TOKENS = 4048
+
+
+def _encode(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class AiPayloadTemplate:
+    """Chat completion request body with the static part serialized once.
+
+    Every request differs in the model and the user message only, so the body is put together from
+    the pre-encoded prefix (settings, response format and the system prompt) and these two values.
+    The prompts are versioned by PROMPT_VERSION.
+    """
+
+    def __init__(self, cacheable_system_prompt: bool) -> None:
+        if cacheable_system_prompt:
+            # The providers supporting prompt caching reuse the prefill of the identical system prompt.
+            system_content: Any = [{"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}]
+        else:
+            system_content = SYSTEM_PROMPT
+
+        self._prefix: bytes = (
+            b'{"max_tokens":' + _encode(_MAX_TOKENS)
+            + b',"response_format":' + _encode(UKRAINIAN_EVENT_RESPONSE_FORMAT)
+            + b',"messages":[' + _encode({"role": "system", "content": system_content})
+            + b',{"role":"user","content":')
+        self._model_part: bytes = b'}],"model":'
+
+    def render(self, model: str, raw_event: str, stream: bool = False) -> bytes:
+        return b"".join((
+            self._prefix,
+            _encode(create_user_prompt(raw_event)),
+            self._model_part,
+            _encode(model),
+            b',"stream":true}' if stream else b'}'))
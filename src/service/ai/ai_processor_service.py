@@ -1,102 +1,319 @@
+import asyncio
+import time
 from abc import ABC
-from typing import override
+from typing import Tuple, override
 
 import backoff
 import httpx
+from pydantic import ValidationError
 
-from src.exception.exception_handler import NotFoundTokenException, AiHttpCallRetryableException, RotatableException
+from src.exception.exception_handler import NotFoundTokenException, AiHttpCallRetryableException, RotatableException, \
+    InvalidAiOutputException, AiUpstreamFailureException, InternalException
+from src.http_client.http_client_manager import HttpClientManager
+from src.metrics.metrics import AI_UPSTREAM_REQUESTS, AI_UPSTREAM_REQUEST_DURATION, AI_RATE_LIMITED, \
+    AI_HTTP_CALL_RETRIES, AI_INVALID_OUTPUTS, AI_RESULT_CACHE_LOOKUPS, ROTATION_ATTEMPTS
+from src.model.ai_route import AiRoute
 from src.model.api_provider import ApiProvider
-from src.model.api_token import ApiToken
-from src.model.event import create_system_message_prompt, create_user_message_prompt
+from src.model.rate_limit_state import RateLimitState
+from src.model.token_lease import TokenLease
 from src.model.ukrainian_event import UkrainianEvent
-from src.repository.ai_api_error_repository import AiApiErrorsRepository
+from src.service.ai.ai_api_errors_writer import AiApiErrorsWriter
+from src.service.ai.ai_circuit_breaker import AiCircuitBreaker
+from src.service.ai.ai_latency_tracker import AiLatencyTracker
+from src.service.ai.ai_model_selector import AiModelSelector, AUTO_MODEL
+from src.service.ai.ai_payload_template import AiPayloadTemplate
+from src.service.ai.ai_result_cache import AiResultCache
+from src.service.ai.ai_stream import AiStream
 from src.service.rotation.rate_checking.rate_limit_checker import RateLimitChecker
 from src.service.rotation.rotatable_service import RotatableService
 from src.service.rotation.token_service import TokenService
+from src.util.json_repair import extract_json_object
 from src.util.logger import get_logger
+from src.util.request_timing import record_stage, stage_timer
+from src.util.single_flight import SingleFlight
 
 logger = get_logger(__name__)
 
+# Answers blaming the token itself: revoked, out of credits or not allowed to the model.
+_TOKEN_ERROR_STATUS_CODES = (401, 402, 403)
+
 
 class AiProcessorService(RotatableService, ABC):
 
     def __init__(self, api_provider: ApiProvider, base_url: str,
                  http_call_retry_count: int, rotation_retry_count: int,
-                 ai_api_errors_repository: AiApiErrorsRepository, token_service: TokenService,
-                 rate_limit_checker: RateLimitChecker):
+                 ai_api_errors_writer: AiApiErrorsWriter, token_service: TokenService,
+                 rate_limit_checker: RateLimitChecker, http_client_manager: HttpClientManager,
+                 result_cache: AiResultCache, payload_template: AiPayloadTemplate, circuit_breaker: AiCircuitBreaker,
+                 latency_tracker: AiLatencyTracker, model_selector: AiModelSelector):
         super().__init__(rotation_retry_count=rotation_retry_count)
         self._api_provider = api_provider
         self._base_url = base_url
         self._http_call_retry_count = http_call_retry_count
-        self._ai_api_errors_repository = ai_api_errors_repository
+        self._ai_api_errors_writer = ai_api_errors_writer
         self._token_service = token_service
         self._rate_limit_checker = rate_limit_checker
-        self._api_key = None
-        self._active_api_token_id = None
+        self._http_client_manager = http_client_manager
+        self._result_cache = result_cache
+        self._payload_template = payload_template
+        self._circuit_breaker = circuit_breaker
+        self._latency_tracker = latency_tracker
+        self._model_selector = model_selector
+        self._single_flight = SingleFlight()
+
+    async def process(self, model: str, raw_event: str, bypass_cache: bool = False) -> UkrainianEvent | None:
+        # Keyed by the requested model, so an "auto" request hits its cached result whichever model gets picked next.
+        cache_key: str = self._result_cache.build_key(self._api_provider, model, raw_event)
+        if not bypass_cache:
+            with stage_timer("cache"):
+                cached_event = await self._result_cache.get(cache_key)
+            AI_RESULT_CACHE_LOOKUPS.labels(self._api_provider.value, "miss" if cached_event is None else "hit").inc()
+            if cached_event is not None:
+                return UkrainianEvent.model_validate(cached_event)
 
-    async def process(self, model: str, raw_event: str) -> UkrainianEvent | None:
-        system_part: dict[str, str] = create_system_message_prompt()
-        user_part: dict[str, str] = create_user_message_prompt(raw_event)
+        resolved_model: str = self._resolve_model(model)
+        # A failing upstream is not worth a token lease; cached results are still served above.
+        self._circuit_breaker.check(self._api_provider, resolved_model)
+        # Identical requests in flight share a single upstream call, and its error as well.
+        return await self._single_flight.do(
+            cache_key, lambda: self._process_uncached(cache_key, model, resolved_model, raw_event))
 
-        processed_event = await self.process_with_token_rotation(model, system_part, user_part)
+    async def _process_uncached(self, cache_key: str, requested_model: str, model: str,
+                                raw_event: str) -> UkrainianEvent | None:
+        started_at = time.perf_counter()
+        processed_event: UkrainianEvent = await self.process_with_token_rotation(model, raw_event)
+        # Cache hits are left out, the hedging delay is derived from the upstream-served latency. It is looked up
+        # by the requested route, so an "auto" one gets the latency of whichever models the selector picks.
+        self._latency_tracker.observe(self._api_provider, requested_model, time.perf_counter() - started_at)
+        # Written on bypass too, so a bypassing call refreshes the cached result.
+        with stage_timer("cache"):
+            await self._result_cache.put(cache_key, self._api_provider, model, processed_event.model_dump(mode="json"))
         return processed_event
 
-    @override
-    async def _process_with_retry(self, model, system_part, user_part) -> UkrainianEvent:
+    async def stream(self, model: str, raw_event: str) -> AiStream:
+        """Open an upstream streamed completion, to be relayed to the caller as its raw SSE chunks.
+
+        The rotation happens while the stream is being opened, i.e. before the first byte reaches the caller;
+        the token stays leased until the returned stream is closed. Streamed completions bypass the result cache.
+        """
+        model = self._resolve_model(model)
+        self._circuit_breaker.check(self._api_provider, model)
+
         async def wrapped():
-            return await self._process_with_retry_internal(model, system_part, user_part)
+            return await self._open_stream_with_token_rotation(model, raw_event)
 
         retryable = backoff.on_exception(
-            backoff.expo, AiHttpCallRetryableException, max_tries=self._http_call_retry_count)(wrapped)
-        return await retryable()
+            backoff.expo, RotatableException, max_tries=self._rotation_retry_count,
+            on_backoff=self._on_rotation_retry)(wrapped)
+        lease, response = await retryable()
+        return AiStream(lease, response, self._release_token)
 
-    async def _process_with_retry_internal(self, model, system_part, user_part):
-        if self._api_key is None:
-            await self._rotate_api_key()
+    async def _open_stream_with_token_rotation(self, model, raw_event) -> Tuple[TokenLease, httpx.Response]:
+        lease: TokenLease = await self._lease_token()
+        opened: bool = False
+        try:
+            async def wrapped():
+                return await self._open_stream(lease, model, raw_event)
 
-        headers = {
-            "Authorization": f"Bearer {self._api_key}",
-            "Content-Type": "application/json",
-        }
+            retryable = backoff.on_exception(
+                backoff.expo, AiHttpCallRetryableException, max_tries=self._http_call_retry_count,
+                on_backoff=self._on_http_call_retry)(wrapped)
+            response: httpx.Response = await retryable()
+            opened = True
+            ROTATION_ATTEMPTS.labels(type(self).__name__, "success").inc()
+            return lease, response
+        except RotatableException as e:
+            ROTATION_ATTEMPTS.labels(type(self).__name__, "rotated").inc()
+            await self._handle_exception(e, lease)
+        except Exception:
+            ROTATION_ATTEMPTS.labels(type(self).__name__, "error").inc()
+            raise
+        finally:
+            if not opened:
+                await self._release_token(lease)
 
-        payload = {
-            "model": model,
-            "messages": [system_part, user_part],
-            "max_tokens": 4048,
-        }
+    async def _open_stream(self, lease: TokenLease, model, raw_event) -> httpx.Response:
+        self._circuit_breaker.acquire(self._api_provider, model)
+        response: httpx.Response | None = None
+        try:
+            client: httpx.AsyncClient = self._http_client_manager.get_client(self._api_provider)
+            request: httpx.Request = client.build_request(
+                "POST", f"{self._base_url}/chat/completions", headers=self._build_headers(lease),
+                content=self._payload_template.render(model, raw_event, stream=True))
+            started_at = time.perf_counter()
+            response = await client.send(request, stream=True)
+            # Timed until the response headers, i.e. the time to the first byte.
+            self._observe_call(model, started_at, response)
+            self._update_rate_limit(lease, response)
+
+            if response.is_error:
+                await response.aread()
+            response.raise_for_status()
+        except asyncio.CancelledError:
+            self._circuit_breaker.release(self._api_provider, model)
+            raise
+        except Exception as e:
+            self._record_circuit_outcome(model, response)
+            if response is not None:
+                await response.aclose()
+            self._raise_call_error(lease, model, response, e)
+
+        self._record_circuit_outcome(model, response)
+        self._token_service.record_success(lease, None)
+        return response
+
+    @override
+    async def _process_with_retry(self, lease: TokenLease, model, raw_event) -> UkrainianEvent:
+        async def wrapped():
+            return await self._process_with_retry_internal(lease, model, raw_event)
+
+        # An output that can not be repaired into a valid event is requested once again, with the same token.
+        retryable = backoff.on_exception(
+            backoff.expo, (AiHttpCallRetryableException, InvalidAiOutputException),
+            max_tries=self._http_call_retry_count, on_backoff=self._on_http_call_retry)(wrapped)
+        return await retryable()
 
+    async def _process_with_retry_internal(self, lease: TokenLease, model, raw_event):
+        self._circuit_breaker.acquire(self._api_provider, model)
+        response: httpx.Response | None = None
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    f"{self._base_url}/chat/completions",
-                    headers=headers,
-                    json=payload)
+            client: httpx.AsyncClient = self._http_client_manager.get_client(self._api_provider)
+            started_at = time.perf_counter()
+            response = await client.post(
+                f"{self._base_url}/chat/completions",
+                headers=self._build_headers(lease),
+                content=self._payload_template.render(model, raw_event))
+            self._observe_call(model, started_at, response)
+            self._update_rate_limit(lease, response)
 
             response.raise_for_status()
 
             response_json = response.json()
-            return response_json
+        except asyncio.CancelledError:
+            self._circuit_breaker.release(self._api_provider, model)
+            raise
         except Exception as e:
-            response_json = response.json()
-            await self._ai_api_errors_repository.save_error(str(response_json), model)
-            if self._rate_limit_checker.is_rate_limit_exception(response_json):
-                logger.warn(f"Rate limit exceeded for Token (id={self._active_api_token_id})")
-                raise RotatableException(response_json, e)
-            raise AiHttpCallRetryableException(response_json, e)
+            self._record_circuit_outcome(model, response)
+            self._raise_call_error(lease, model, response, e)
+
+        self._record_circuit_outcome(model, response)
+        # An invalid output is the model's fault, the token did its job.
+        self._token_service.record_success(lease, response.elapsed.total_seconds())
+        with stage_timer("parse"):
+            try:
+                processed_event: UkrainianEvent = self._parse_event(response_json, model)
+            except InvalidAiOutputException:
+                self._model_selector.record_failure(self._api_provider, model)
+                raise
+        self._model_selector.record_success(self._api_provider, model, response.elapsed.total_seconds())
+        return processed_event
+
+    def _resolve_model(self, model: str) -> str:
+        if model != AUTO_MODEL:
+            return model
+
+        route: AiRoute | None = self._model_selector.choose(self._api_provider)
+        if route is None:
+            raise InternalException(f"No models configured for the '{AUTO_MODEL}' model of {self._api_provider}.")
+        return route.model
+
+    def _parse_event(self, response_json, model) -> UkrainianEvent:
+        content = None
+        try:
+            content = response_json["choices"][0]["message"]["content"]
+            try:
+                return UkrainianEvent.model_validate_json(content)
+            except ValidationError:
+                # Fenced, wrapped in prose or slightly malformed JSON is repaired locally instead of re-requested.
+                repaired: dict | None = extract_json_object(content)
+                if repaired is None:
+                    raise
+                return UkrainianEvent.model_validate(repaired)
+        except (KeyError, IndexError, TypeError, ValidationError) as e:
+            logger.warn(f"{self._api_provider} model '{model}' returned an invalid event.", error=repr(e))
+            AI_INVALID_OUTPUTS.labels(self._api_provider.value, model).inc()
+            self._ai_api_errors_writer.record(str(content or response_json), model)
+            raise InvalidAiOutputException(content or response_json, e)
+
+    @staticmethod
+    def _build_headers(lease: TokenLease) -> dict[str, str]:
+        return {
+            "Authorization": f"Bearer {lease.api_token.value}",
+            "Content-Type": "application/json",
+        }
+
+    def _raise_call_error(self, lease: TokenLease, model, response: httpx.Response | None, e: Exception):
+        if response is None:
+            AI_UPSTREAM_REQUESTS.labels(self._api_provider.value, model, "error").inc()
+        response_json = self._read_error_response(response, e)
+        self._ai_api_errors_writer.record(str(response_json), model)
+        if self._rate_limit_checker.is_rate_limit_exception(response_json):
+            logger.warn(f"Rate limit exceeded for Token (id={lease.api_token.token_id})")
+            AI_RATE_LIMITED.labels(self._api_provider.value).inc()
+            self._model_selector.record_rate_limited(self._api_provider, model)
+            self._token_service.record_rate_limited(lease)
+            unlock_at: float | None = self._rate_limit_checker.estimate_unlock_at(
+                response_json, response.headers if response is not None else {})
+            raise RotatableException(response_json, e, unlock_at)
+        if response is None or response.status_code >= 500:
+            self._model_selector.record_failure(self._api_provider, model)
+            raise AiUpstreamFailureException(response_json, e)
+        if response.status_code in _TOKEN_ERROR_STATUS_CODES:
+            self._token_service.record_error(lease)
+        raise AiHttpCallRetryableException(response_json, e)
+
+    def _record_circuit_outcome(self, model, response: httpx.Response | None) -> None:
+        # Any answer below 500 means the upstream is up, even a rate limit or a rejected token.
+        if response is None or response.status_code >= 500:
+            self._circuit_breaker.record_failure(self._api_provider, model)
+        else:
+            self._circuit_breaker.record_success(self._api_provider, model)
+
+    def _observe_call(self, model, started_at: float, response: httpx.Response) -> None:
+        duration: float = time.perf_counter() - started_at
+        AI_UPSTREAM_REQUEST_DURATION.labels(self._api_provider.value, model).observe(duration)
+        record_stage("upstream", duration)
+        AI_UPSTREAM_REQUESTS.labels(self._api_provider.value, model, str(response.status_code)).inc()
+
+    def _on_http_call_retry(self, details) -> None:
+        AI_HTTP_CALL_RETRIES.labels(self._api_provider.value).inc()
+        record_stage("backoff", details['wait'])
+
+    def _update_rate_limit(self, lease: TokenLease, response: httpx.Response) -> None:
+        # Lets the token get paused before the provider starts answering with 429.
+        rate_limit_state: RateLimitState | None = self._rate_limit_checker.parse_rate_limit_headers(response.headers)
+        if rate_limit_state is not None:
+            self._token_service.update_rate_limit(lease, rate_limit_state)
+
+    @staticmethod
+    def _read_error_response(response: httpx.Response | None, e: Exception):
+        if response is None:
+            # No response at all, e.g. a connect/read timeout on the pooled connection.
+            return repr(e)
+        try:
+            return response.json()
+        except ValueError:
+            return response.text
 
-    # ToDo: 19/10 What the behaviour when parallel threads call this method.
     @override
-    async def _rotate_api_key(self) -> None:
-        if self._api_key is not None:
-            await self._token_service.lock(self._active_api_token_id)
+    async def _handle_exception(self, e: RotatableException, lease: TokenLease):
+        if isinstance(e, AiUpstreamFailureException):
+            # The token is fine, the next attempt just goes with another one; the circuit breaker covers the upstream.
+            raise e
+        await super()._handle_exception(e, lease)
 
-        api_token: ApiToken = await self._token_service.get_random_by_api_provider(self._api_provider)
-        if api_token is None:
-            self._api_key = None
-            self._active_api_token_id = -1
-            raise NotFoundTokenException(f"No API key found for {self._api_provider} in DB.")
+    @override
+    async def _lease_token(self) -> TokenLease:
+        lease: TokenLease | None = await self._token_service.lease(self._api_provider)
+        if lease is None:
+            raise NotFoundTokenException(f"No API key available for {self._api_provider} in DB.")
+        return lease
 
-        self._api_key = api_token.value
-        self._active_api_token_id = api_token.token_id
+    @override
+    async def _release_token(self, lease: TokenLease) -> None:
+        await self._token_service.release(lease)
 
-        logger.info(f"{self._api_provider} API key has been rotated (new token_id: {self._active_api_token_id}).")
+    @override
+    async def _retire_token(self, lease: TokenLease, unlock_at: float | None) -> None:
+        await self._token_service.lock_leased(lease, unlock_at)
+        logger.info(f"{self._api_provider} Token (id={lease.api_token.token_id}) has been retired.")
@@ -0,0 +1,9 @@
+from src.model.api_provider import ApiProvider
+from src.service.ai.ai_processor_service import AiProcessorService
+from src.service.ai.impl.open_ai_processor_service import open_ai_processor_service
+from src.service.ai.impl.open_router_processor_service import open_router_processor_service
+
+ai_processors_map: dict[ApiProvider, AiProcessorService] = {
+    ApiProvider.OPEN_AI: open_ai_processor_service,
+    ApiProvider.OPEN_ROUTER: open_router_processor_service
+}
@@ -0,0 +1,64 @@
+import hashlib
+import re
+import unicodedata
+from typing import Any, Optional
+
+from src.config.settings import settings, AiResultCacheSettings
+from src.model.api_provider import ApiProvider
+from src.model.event import PROMPT_VERSION
+from src.repository.ai_result_cache_repository import AiResultCacheRepository, ai_result_cache_repository
+from src.util.logger import get_logger
+from src.util.ttl_lru_cache import TtlLruCache
+
+logger = get_logger(__name__)
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+class AiResultCache:
+    """Two-tier cache of the processed events: an in-process LRU in front of a Postgres table.
+
+    Results are addressed by the hash of the provider, model, prompt version and the normalized raw event,
+    so re-submitted posts are answered without an upstream call. Cache failures never fail the request.
+    """
+
+    def __init__(self, repository: AiResultCacheRepository, ai_result_cache_settings: AiResultCacheSettings) -> None:
+        self._repository = repository
+        self._settings = ai_result_cache_settings
+        self._memory_cache: TtlLruCache[str, Any] = TtlLruCache(
+            ai_result_cache_settings.memory_max_size, ai_result_cache_settings.ttl_seconds)
+
+    @staticmethod
+    def build_key(api_provider: ApiProvider, model: str, raw_event: str) -> str:
+        normalized_event: str = _WHITESPACE_PATTERN.sub(" ", unicodedata.normalize("NFC", raw_event)).strip()
+        key_source: str = "\x1f".join((api_provider.value, model, PROMPT_VERSION, normalized_event))
+        return hashlib.sha256(key_source.encode()).hexdigest()
+
+    async def get(self, cache_key: str) -> Optional[Any]:
+        result: Optional[Any] = self._memory_cache.get(cache_key)
+        if result is not None:
+            return result
+
+        try:
+            result = await self._repository.get_result(cache_key)
+        except Exception as e:
+            logger.warning("Failed to read AI result cache.", error=str(e))
+            return None
+
+        if result is not None:
+            self._memory_cache.put(cache_key, result)
+        return result
+
+    async def put(self, cache_key: str, api_provider: ApiProvider, model: str, result: Any) -> None:
+        self._memory_cache.put(cache_key, result)
+        try:
+            await self._repository.save_result(cache_key, api_provider, model, result, self._settings.ttl_seconds)
+        except Exception as e:
+            logger.warning("Failed to write AI result cache.", error=str(e))
+
+    async def purge(self) -> None:
+        deleted_count: int = await self._repository.delete_expired_and_oldest(self._settings.db_max_rows)
+        logger.info(f"AI result cache purged ({deleted_count} rows deleted).")
+
+
+ai_result_cache = AiResultCache(ai_result_cache_repository, settings.ai_result_cache)
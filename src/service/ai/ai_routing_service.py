@@ -0,0 +1,112 @@
+import asyncio
+from typing import Dict, List, Optional, Set
+
+from src.config.settings import settings, AiRoutingSettings
+from src.exception.exception_handler import NotFoundTokenException, CircuitOpenException, RotatableException
+from src.metrics.metrics import AI_FAILOVERS, AI_HEDGED_REQUESTS
+from src.model.ai_route import AiRoute
+from src.model.api_provider import ApiProvider
+from src.model.ukrainian_event import UkrainianEvent
+from src.service.ai.ai_latency_tracker import AiLatencyTracker, ai_latency_tracker
+from src.service.ai.ai_processor_service import AiProcessorService
+from src.service.ai.ai_processors import ai_processors_map
+from src.service.ai.ai_stream import AiStream
+from src.util.logger import get_logger
+
+logger = get_logger(__name__)
+
+# The route can not answer right now: no token left, the rotation gave up or the circuit is open.
+_FAILOVER_EXCEPTIONS = (NotFoundTokenException, RotatableException, CircuitOpenException)
+
+
+class AiRoutingService:
+    """Sends a request over an ordered chain of provider/model routes instead of a single one.
+
+    Failover moves on to the next route once the current one is unavailable. Hedging additionally fires
+    a second request down the chain when the first one is still running after the observed latency
+    quantile of its route; whichever answers first wins and the other one is cancelled. Its upstream call
+    is cancelled as well, releasing its token, unless an identical request is still waiting on it.
+    """
+
+    def __init__(self, processors: Dict[ApiProvider, AiProcessorService], latency_tracker: AiLatencyTracker,
+                 ai_routing_settings: AiRoutingSettings) -> None:
+        self._processors = processors
+        self._latency_tracker = latency_tracker
+        self._settings = ai_routing_settings
+
+    def build_chain(self, route: AiRoute, fallbacks: Optional[List[AiRoute]] = None) -> List[AiRoute]:
+        """The requested route followed by the given fallbacks, or by the configured chain if none given."""
+        chain: List[AiRoute] = [route]
+        for fallback in fallbacks if fallbacks is not None else self._settings.fallback_chain:
+            if fallback not in chain:
+                chain.append(fallback)
+        return chain
+
+    async def process(self, chain: List[AiRoute], raw_event: str, bypass_cache: bool = False,
+                      hedged: bool = False) -> UkrainianEvent | None:
+        if not hedged or len(chain) < 2:
+            return await self._process_with_failover(chain, raw_event, bypass_cache)
+
+        primary: asyncio.Task = asyncio.ensure_future(self._process_with_failover(chain, raw_event, bypass_cache))
+        hedge: Optional[asyncio.Task] = None
+        try:
+            hedge_delay: Optional[float] = self._latency_tracker.quantile(
+                chain[0].api_provider, chain[0].model, self._settings.hedge_quantile)
+            if hedge_delay is None:
+                # Not enough observations to tell a slow request from a usual one.
+                return await primary
+
+            done: Set[asyncio.Future]
+            done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+            if done:
+                return primary.result()
+
+            hedge = asyncio.ensure_future(self._process_with_failover(chain[1:], raw_event, bypass_cache))
+            pending: Set[asyncio.Future] = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        AI_HEDGED_REQUESTS.labels("primary" if task is primary else "hedge").inc()
+                        return task.result()
+
+            AI_HEDGED_REQUESTS.labels("none").inc()
+            return primary.result()
+        finally:
+            for task in (primary, hedge):
+                if task is not None:
+                    task.cancel()
+
+    async def stream(self, chain: List[AiRoute], raw_event: str) -> AiStream:
+        """Open the stream on the first available route; nothing can be failed over once it is opened."""
+        last_error: Optional[Exception] = None
+        for index, route in enumerate(chain):
+            try:
+                return await self._processors[route.api_provider].stream(route.model, raw_event)
+            except _FAILOVER_EXCEPTIONS as e:
+                last_error = e
+                self._on_route_failed(chain, index, e)
+        raise last_error
+
+    async def _process_with_failover(self, chain: List[AiRoute], raw_event: str,
+                                     bypass_cache: bool) -> UkrainianEvent | None:
+        last_error: Optional[Exception] = None
+        for index, route in enumerate(chain):
+            try:
+                return await self._processors[route.api_provider].process(route.model, raw_event, bypass_cache)
+            except _FAILOVER_EXCEPTIONS as e:
+                last_error = e
+                self._on_route_failed(chain, index, e)
+        raise last_error
+
+    @staticmethod
+    def _on_route_failed(chain: List[AiRoute], index: int, e: Exception) -> None:
+        route: AiRoute = chain[index]
+        if index + 1 < len(chain):
+            AI_FAILOVERS.labels(route.api_provider.value, route.model).inc()
+            next_route: AiRoute = chain[index + 1]
+            logger.warning(f"{route.api_provider} model '{route.model}' is unavailable, failing over to "
+                           f"{next_route.api_provider} model '{next_route.model}'.", error=str(e))
+
+
+ai_routing_service = AiRoutingService(ai_processors_map, ai_latency_tracker, settings.ai_routing)
@@ -0,0 +1,43 @@
+from typing import AsyncIterator, Awaitable, Callable
+
+import httpx
+
+from src.model.token_lease import TokenLease
+from src.util.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class AiStream:
+    """Opened upstream streamed completion, relayed as its raw SSE chunks, holding the token lease until closed.
+
+    Closing is idempotent and does not depend on the chunks being iterated at all: the caller has to close
+    it in any case, e.g. when the client goes away before the first chunk is pulled.
+    """
+
+    def __init__(self, lease: TokenLease, response: httpx.Response,
+                 release_token: Callable[[TokenLease], Awaitable[None]]) -> None:
+        self._lease = lease
+        self._response = response
+        self._release_token = release_token
+        self._closed: bool = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in self._response.aiter_raw():
+                yield chunk
+        except httpx.HTTPError as e:
+            # Nothing can be rotated once the first bytes are sent, the caller just gets a truncated stream.
+            logger.warning(f"Upstream stream broke for Token (id={self._lease.api_token.token_id}).", error=repr(e))
+        finally:
+            await self.aclose()
+
+    async def aclose(self) -> None:
+        if self._closed:
+            return
+
+        self._closed = True
+        try:
+            await self._response.aclose()
+        finally:
+            await self._release_token(self._lease)
@@ -1,7 +1,13 @@
 from src.config.settings import settings
+from src.http_client.http_client_manager import HttpClientManager, http_client_manager_instance
 from src.model.api_provider import ApiProvider
-from src.repository.ai_api_error_repository import AiApiErrorsRepository, ai_api_errors_repository
+from src.service.ai.ai_api_errors_writer import AiApiErrorsWriter, ai_api_errors_writer
+from src.service.ai.ai_circuit_breaker import AiCircuitBreaker, ai_circuit_breaker
+from src.service.ai.ai_latency_tracker import AiLatencyTracker, ai_latency_tracker
+from src.service.ai.ai_model_selector import AiModelSelector, ai_model_selector
+from src.service.ai.ai_payload_template import AiPayloadTemplate
 from src.service.ai.ai_processor_service import AiProcessorService
+from src.service.ai.ai_result_cache import AiResultCache, ai_result_cache
 from src.service.rotation.rate_checking.impl.open_router_rate_limit_checker import open_router_rate_limit_checker
 from src.service.rotation.rate_checking.rate_limit_checker import RateLimitChecker
 from src.service.rotation.token_service import TokenService, token_service
@@ -12,14 +18,17 @@ logger = get_logger(__name__)
 
 class OpenRouterProcessorService(AiProcessorService):
     _API_PROVIDER: ApiProvider = ApiProvider.OPEN_ROUTER
-    _BASE_URL: str = "https://openrouter.ai/api/v1"
 
-    def __init__(self, http_call_retry_count: int, rotation_retry_count: int,
-                 ai_api_errors_repo: AiApiErrorsRepository, token_management_service: TokenService,
-                 rate_limit_checker: RateLimitChecker):
-        super().__init__(self._API_PROVIDER, self._BASE_URL,
+    def __init__(self, base_url: str, http_call_retry_count: int, rotation_retry_count: int,
+                 ai_api_errors_writer: AiApiErrorsWriter, token_management_service: TokenService,
+                 rate_limit_checker: RateLimitChecker, http_client_manager: HttpClientManager,
+                 result_cache: AiResultCache, payload_template: AiPayloadTemplate,
+                 circuit_breaker: AiCircuitBreaker, latency_tracker: AiLatencyTracker,
+                 model_selector: AiModelSelector):
+        super().__init__(self._API_PROVIDER, base_url,
                          http_call_retry_count, rotation_retry_count,
-                         ai_api_errors_repo, token_management_service, rate_limit_checker)
+                         ai_api_errors_writer, token_management_service, rate_limit_checker, http_client_manager,
+                         result_cache, payload_template, circuit_breaker, latency_tracker, model_selector)
 
 
 # model='deepseek/deepseek-r1:free' - the most
@@ -28,8 +37,16 @@ class OpenRouterProcessorService(AiProcessorService):
 # model='qwen/qwen3-4b:free'
 # model='deepseek/deepseek-r1-0528-qwen3-8b:free'
 open_router_processor_service: AiProcessorService = OpenRouterProcessorService(
+    base_url=settings.open_router_settings.base_url,
     http_call_retry_count=settings.open_router_settings.http_call_retry_count,
     rotation_retry_count=settings.open_router_settings.rotation_retry_count,
-    ai_api_errors_repo=ai_api_errors_repository,
+    ai_api_errors_writer=ai_api_errors_writer,
     token_management_service=token_service,
-    rate_limit_checker=open_router_rate_limit_checker)
+    rate_limit_checker=open_router_rate_limit_checker,
+    http_client_manager=http_client_manager_instance,
+    result_cache=ai_result_cache,
+    # OpenRouter passes cache_control on to the providers supporting prompt caching.
+    payload_template=AiPayloadTemplate(cacheable_system_prompt=True),
+    circuit_breaker=ai_circuit_breaker,
+    latency_tracker=ai_latency_tracker,
+    model_selector=ai_model_selector)
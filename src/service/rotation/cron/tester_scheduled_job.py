@@ -1,26 +1,16 @@
-import random
 from typing import List, Dict, Any
 
 from src.config.settings import settings
+from src.metrics.metrics import track_job
 from src.repository.event_repository import event_repository
+from src.service.ai.ai_model_selector import AUTO_MODEL
 from src.service.ai.impl.open_router_processor_service import open_router_processor_service
 from src.util.logger import get_logger
 
 logger = get_logger(__name__)
 
 
-open_router_free_models: set = {
-    "deepseek/deepseek-r1:free",
-    "meta-llama/llama-4-scout:free",
-    "qwen/qwen3-4b:free",
-    "microsoft/mai-ds-r1:free",
-    "deepseek/deepseek-r1-0528-qwen3-8b:free" }
-
-
-def get_random_model():
-    return random.choice(list(open_router_free_models))
-
-
+@track_job("rotation_tester")
 async def tester_scheduled_job():
     logger.info("Running scheduled job for the 'Rotation Service' testing...")
 
@@ -29,7 +19,9 @@ async def tester_scheduled_job():
 
     for raw_event in raw_events:
         try:
-            await open_router_processor_service.process(get_random_model(), raw_event.get('raw_text'))
+            # The cache is bypassed, the job is meant to exercise the upstream calls and the rotation;
+            # the model is chosen by the same selector as for the "auto" requests, feeding it as well.
+            await open_router_processor_service.process(AUTO_MODEL, raw_event.get('raw_text'), bypass_cache=True)
         except Exception as e:
             logger.warning(f"Failed to process raw_event, exception: '{e}'")
 
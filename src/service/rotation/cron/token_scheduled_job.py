@@ -1,5 +1,9 @@
-from typing import List
+import asyncio
+import time
+from typing import Dict, List, Optional
 
+from src.config.settings import settings
+from src.metrics.metrics import TOKENS_LOCKED, track_job
 from src.model.api_provider import ApiProvider
 from src.model.api_token import ApiToken
 from src.service.rotation.rate_checking.impl.open_ai_rate_limit_checker import open_ai_rate_limit_checker
@@ -17,20 +21,54 @@ rate_limit_checker_map: dict[ApiProvider, RateLimitChecker] = {
 }
 
 
+async def _refresh_locked_tokens_gauge() -> None:
+    try:
+        locked_counts: Dict[ApiProvider, int] = await token_service.count_locked_tokens()
+    except Exception as e:
+        logger.warning(f'Failed to count locked tokens, exception: {e}')
+        return
+
+    for api_provider in ApiProvider:
+        TOKENS_LOCKED.labels(api_provider.value).set(locked_counts.get(api_provider, 0))
+
+
+@track_job("unlock_tokens")
 async def unlock_tokens_scheduled_job():
     logger.info("Running scheduled job...")
-    locked_tokens: List[ApiToken] = await token_service.get_locked_tokens()
+    started_at = time.perf_counter()
+
+    await _refresh_locked_tokens_gauge()
+
+    # Tokens with a known recovery time are unlocked on time by the unlock scheduler,
+    # this job only checks the ones it could not tell the time for, or missed.
+    locked_tokens: List[ApiToken] = await token_service.get_locked_tokens_due_for_check()
 
     if not locked_tokens:
         logger.info("No locked tokens found, skipping further processing")
         return
 
-    for locked_token in locked_tokens:
-        logger.info(f'Checking token (id={locked_token.token_id}) for potential unlock.')
-        rate_limit_checker: RateLimitChecker = rate_limit_checker_map.get(locked_token.api_provider)
-        is_token_unlocked: bool = await rate_limit_checker.is_unlocked(locked_token.value)
-        if is_token_unlocked:
-            logger.info(f'Unlocking token (id={locked_token.token_id}).')
-            await token_service.unlock(locked_token.token_id)
+    semaphore = asyncio.Semaphore(settings.rotation.sweep_concurrency)
+
+    async def check(locked_token: ApiToken) -> Optional[bool]:
+        async with semaphore:
+            logger.info(f'Checking token (id={locked_token.token_id}) for potential unlock.')
+            rate_limit_checker: RateLimitChecker = rate_limit_checker_map.get(locked_token.api_provider)
+            try:
+                return await rate_limit_checker.is_unlocked(locked_token.value)
+            except Exception as e:
+                logger.warning(f'Failed to check token (id={locked_token.token_id}), exception: {e}')
+                return None
+
+    results: List[Optional[bool]] = await asyncio.gather(*(check(locked_token) for locked_token in locked_tokens))
+
+    token_ids_to_unlock: List[int] = [
+        locked_token.token_id for locked_token, is_unlocked in zip(locked_tokens, results) if is_unlocked]
+    unlocked_token_ids: List[int] = await token_service.unlock_many(token_ids_to_unlock)
 
-    logger.info(f'Scheduled has finished.')
+    logger.info(
+        'Scheduled has finished.',
+        duration_seconds=round(time.perf_counter() - started_at, 3),
+        checked=len(locked_tokens),
+        unlocked=len(unlocked_token_ids),
+        still_locked=results.count(False),
+        failed=results.count(None))
@@ -1,7 +1,14 @@
-from typing import override, Any
+import re
+import time
+from typing import override, Any, Mapping, Optional
 
+from src.model.rate_limit_state import RateLimitState
 from src.service.rotation.rate_checking.rate_limit_checker import RateLimitChecker
 
+# OpenAI reports the reset as a duration, e.g. '1s', '6m0s' or '20ms'.
+_DURATION_PART_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNIT_SECONDS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
 
 class OpenAiRateLimitChecker(RateLimitChecker):
 
@@ -10,10 +17,38 @@ class OpenAiRateLimitChecker(RateLimitChecker):
         # ToDo: 03/11 It's mocked now
         pass
 
+    @override
+    def parse_rate_limit_headers(self, headers: Mapping[str, str]) -> Optional[RateLimitState]:
+        remaining: Optional[str] = headers.get("x-ratelimit-remaining-requests")
+        reset: Optional[str] = headers.get("x-ratelimit-reset-requests")
+        if remaining is None or reset is None:
+            return None
+
+        limit: Optional[str] = headers.get("x-ratelimit-limit-requests")
+        try:
+            return RateLimitState(
+                limit=int(limit) if limit is not None else None,
+                remaining=int(remaining),
+                reset_at=time.time() + self._parse_duration(reset))
+        except ValueError:
+            return None
+
+    @override
+    def estimate_unlock_at(self, http_response_json: Any, headers: Mapping[str, str]) -> Optional[float]:
+        state: Optional[RateLimitState] = self.parse_rate_limit_headers(headers)
+        return state.reset_at if state is not None else None
+
     @override
     async def is_unlocked(self, token: str) -> bool:
         # ToDo: 03/10 It's mocked now
         return False
 
+    @staticmethod
+    def _parse_duration(duration: str) -> float:
+        parts = _DURATION_PART_PATTERN.findall(duration)
+        if not parts:
+            raise ValueError(f"Unexpected duration: '{duration}'")
+        return sum(float(value) * _DURATION_UNIT_SECONDS[unit] for value, unit in parts)
+
 
 open_ai_rate_limit_checker = OpenAiRateLimitChecker()
@@ -1,17 +1,26 @@
-from typing import override, Any
+import time
+from datetime import datetime, timedelta, timezone
+from typing import override, Any, Mapping, Optional
 
 import httpx
 
+from src.config.settings import settings
+from src.http_client.http_client_manager import HttpClientManager, http_client_manager_instance
+from src.model.api_provider import ApiProvider
+from src.model.rate_limit_state import RateLimitState
 from src.service.rotation.rate_checking.rate_limit_checker import RateLimitChecker
 from src.util.logger import get_logger
 
 
 logger = get_logger(__name__)
 
+_PER_MINUTE_WINDOW_SECONDS = 60
+
+
 class OpenRouterRateLimitChecker(RateLimitChecker):
 
-    def __init__(self, url: str, model: str):
-        self._httpx_limits = httpx.Limits(max_connections=1, max_keepalive_connections=1)
+    def __init__(self, url: str, model: str, http_client_manager: HttpClientManager):
+        self._http_client_manager = http_client_manager
         self._url = url
         self._model = model
 
@@ -26,21 +35,60 @@ class OpenRouterRateLimitChecker(RateLimitChecker):
 
         return False
 
+    @override
+    def parse_rate_limit_headers(self, headers: Mapping[str, str]) -> Optional[RateLimitState]:
+        remaining: Optional[str] = headers.get("x-ratelimit-remaining")
+        reset: Optional[str] = headers.get("x-ratelimit-reset")
+        if remaining is None or reset is None:
+            return None
+
+        limit: Optional[str] = headers.get("x-ratelimit-limit")
+        try:
+            # OpenRouter reports the reset time as a UNIX timestamp in milliseconds.
+            return RateLimitState(
+                limit=int(limit) if limit is not None else None,
+                remaining=int(remaining),
+                reset_at=int(reset) / 1000)
+        except ValueError:
+            logger.warning(f"Unexpected rate-limit headers: remaining={remaining}, reset={reset}, limit={limit}")
+            return None
+
+    @override
+    def estimate_unlock_at(self, response_json: Any, headers: Mapping[str, str]) -> Optional[float]:
+        error: dict = response_json.get("error", {}) if isinstance(response_json, dict) else {}
+        metadata: dict = error.get("metadata") or {}
+
+        # OpenRouter puts the rate-limit headers into the error payload, the response ones are the fallback.
+        for rate_limit_headers in (httpx.Headers(metadata.get("headers") or {}), headers):
+            state: Optional[RateLimitState] = self.parse_rate_limit_headers(rate_limit_headers)
+            if state is not None and state.reset_at > time.time():
+                return state.reset_at
+
+        message: str = str(error.get("message", ""))
+        if "per-day" in message:
+            # The daily cap of the free models is reset at midnight UTC.
+            tomorrow = datetime.now(timezone.utc).date() + timedelta(days=1)
+            return datetime.combine(tomorrow, datetime.min.time(), tzinfo=timezone.utc).timestamp()
+        if "per-min" in message:
+            return time.time() + _PER_MINUTE_WINDOW_SECONDS
+
+        return None
+
     @override
     async def is_unlocked(self, token: str) -> bool:
         headers = {
             "Authorization": f"Bearer {token}",
         }
 
-        async with httpx.AsyncClient(limits=self._httpx_limits) as client:
-            resp = await client.post(
-                self._url,
-                headers=headers,
-                json={
-                    "model": self._model,
-                    "messages": [{"role": "user", "content": "Are you healthy?"}],
-                }
-            )
+        client: httpx.AsyncClient = self._http_client_manager.get_client(ApiProvider.OPEN_ROUTER)
+        resp = await client.post(
+            self._url,
+            headers=headers,
+            json={
+                "model": self._model,
+                "messages": [{"role": "user", "content": "Are you healthy?"}],
+            }
+        )
 
         response_json = resp.json()
 
@@ -49,5 +97,6 @@ class OpenRouterRateLimitChecker(RateLimitChecker):
 
 
 open_router_rate_limit_checker = OpenRouterRateLimitChecker(
-    url="https://openrouter.ai/api/v1/chat/completions",
-    model="meta-llama/llama-4-scout:free")
+    url=f"{settings.open_router_settings.base_url}/chat/completions",
+    model="meta-llama/llama-4-scout:free",
+    http_client_manager=http_client_manager_instance)
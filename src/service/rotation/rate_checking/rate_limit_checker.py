@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, Mapping, Optional
+
+from src.model.rate_limit_state import RateLimitState
 
 
 class RateLimitChecker(ABC):
@@ -8,6 +10,15 @@ class RateLimitChecker(ABC):
     def is_rate_limit_exception(self, http_response_json: Any) -> bool:
         pass
 
+    @abstractmethod
+    def parse_rate_limit_headers(self, headers: Mapping[str, str]) -> Optional[RateLimitState]:
+        pass
+
+    @abstractmethod
+    def estimate_unlock_at(self, http_response_json: Any, headers: Mapping[str, str]) -> Optional[float]:
+        """UNIX time the rate-limited token is expected to recover at, None if it cannot be told."""
+        pass
+
     @abstractmethod
     async def is_unlocked(self, token: str) -> bool:
         pass
@@ -3,7 +3,10 @@ from abc import ABC, abstractmethod
 import backoff
 
 from src.exception.exception_handler import RotatableException
+from src.metrics.metrics import ROTATION_ATTEMPTS, ROTATION_RETRIES
+from src.model.token_lease import TokenLease
 from src.util.logger import get_logger
+from src.util.request_timing import record_stage, stage_timer
 
 logger = get_logger(__name__)
 
@@ -18,24 +21,47 @@ class RotatableService(ABC):
             return await self._process_with_token_rotation_internal(*args, **kwargs)
 
         retryable = backoff.on_exception(
-            backoff.expo, RotatableException, max_tries=self._rotation_retry_count)(wrapped)
+            backoff.expo, RotatableException, max_tries=self._rotation_retry_count,
+            on_backoff=self._on_rotation_retry)(wrapped)
         return await retryable()
 
     async def _process_with_token_rotation_internal(self, *args, **kwargs):
+        # Every attempt leases its own token, the next attempt picks another one if this one gets locked.
+        lease: TokenLease = await self._lease_token()
         try:
-            result = await self._process_with_retry(*args, **kwargs)
+            result = await self._process_with_retry(lease, *args, **kwargs)
+            ROTATION_ATTEMPTS.labels(type(self).__name__, "success").inc()
             return result
         except RotatableException as e:
-            await self._handle_exception(e)
+            ROTATION_ATTEMPTS.labels(type(self).__name__, "rotated").inc()
+            await self._handle_exception(e, lease)
+        except Exception:
+            ROTATION_ATTEMPTS.labels(type(self).__name__, "error").inc()
+            raise
+        finally:
+            await self._release_token(lease)
 
-    async def _handle_exception(self, e: RotatableException):
-        await self._rotate_api_key()
+    async def _handle_exception(self, e: RotatableException, lease: TokenLease):
+        with stage_timer("rotation"):
+            await self._retire_token(lease, e.unlock_at)
         raise e
 
+    def _on_rotation_retry(self, details) -> None:
+        ROTATION_RETRIES.labels(type(self).__name__).inc()
+        record_stage("backoff", details['wait'])
+
+    @abstractmethod
+    async def _process_with_retry(self, lease: TokenLease, *args, **kwargs):
+        pass
+
+    @abstractmethod
+    async def _lease_token(self) -> TokenLease:
+        pass
+
     @abstractmethod
-    async def _process_with_retry(self, *args, **kwargs):
+    async def _release_token(self, lease: TokenLease) -> None:
         pass
 
     @abstractmethod
-    async def _rotate_api_key(self) -> None:
+    async def _retire_token(self, lease: TokenLease, unlock_at: float | None) -> None:
         pass
@@ -0,0 +1,36 @@
+from typing import Optional
+
+from src.model.rate_limit_state import RateLimitState
+
+
+class TokenBucket:
+    """Client-side view of the rate-limit window of a single token.
+
+    The provider headers set the bucket, every lease takes one request from it ahead of the call,
+    and it refills once the reported reset time has passed. Until the first headers arrive the
+    bucket is unknown and never pauses the token.
+    """
+
+    def __init__(self) -> None:
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None
+
+    def update(self, state: RateLimitState) -> None:
+        self.limit = state.limit
+        self.remaining = state.remaining
+        self.reset_at = state.reset_at
+
+    def is_paused(self, now: float, reserve: int) -> bool:
+        self._refill_if_reset(now)
+        return self.remaining is not None and self.remaining <= reserve
+
+    def consume(self, now: float) -> None:
+        self._refill_if_reset(now)
+        if self.remaining is not None:
+            self.remaining -= 1
+
+    def _refill_if_reset(self, now: float) -> None:
+        if self.reset_at is not None and now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = None
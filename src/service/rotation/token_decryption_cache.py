@@ -0,0 +1,34 @@
+from typing import Optional, Tuple
+
+from src.util.ttl_lru_cache import TtlLruCache
+
+
+class TokenDecryptionCache:
+    """Bounded cache of decrypted token values with a TTL.
+
+    An entry is stored per token id along with the ciphertext it was decrypted from,
+    so a re-encrypted token misses the cache instead of returning the stale value.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float) -> None:
+        self._cache: TtlLruCache[int, Tuple[str, str]] = TtlLruCache(max_size, ttl_seconds)
+
+    def get(self, token_id: int, token_encrypted: str) -> Optional[str]:
+        entry: Optional[Tuple[str, str]] = self._cache.get(token_id)
+        if entry is None:
+            return None
+
+        cached_token_encrypted, value = entry
+        if cached_token_encrypted != token_encrypted:
+            self._cache.evict(token_id)
+            return None
+        return value
+
+    def put(self, token_id: int, token_encrypted: str, value: str) -> None:
+        self._cache.put(token_id, (token_encrypted, value))
+
+    def evict(self, token_id: int) -> None:
+        self._cache.evict(token_id)
+
+    def size(self) -> int:
+        return self._cache.size()
@@ -0,0 +1,175 @@
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from src.config.settings import settings, TokenHealthSettings
+from src.repository.token_health_repository import TokenHealthRepository, token_health_repository
+from src.util.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class _TokenHealth:
+
+    def __init__(self) -> None:
+        self.success_ratio: float = 1.0
+        self.latency_seconds: Optional[float] = None
+        self.time_to_rate_limit_seconds: Optional[float] = None
+        self.successes: int = 0
+        self.rate_limits: int = 0
+        self.errors: int = 0
+        # Successes and errors seen since the last quarantine, so a token just back from it is judged anew.
+        self.observations: int = 0
+        self.quarantines: int = 0
+        self.available_since: Optional[float] = None
+
+
+class TokenHealthTracker:
+    """Rolling health statistics of every token, and the health score the tokens get leased by.
+
+    Every token keeps the EWMAs of its share of successful requests, of its latency and of the time
+    it lasts from getting unlocked until the next 429. A 429 is the regular end of a token's turn,
+    not a failure, so it only counts towards the latter. The score is the success share, scaled down
+    for the tokens hitting their rate limit soon after every unlock; the latency is for monitoring only,
+    it depends on the model far more than on the token. Tokens whose success share falls under the threshold
+    get quarantined, i.e. locked for a long while, the next time they get locked. The stats are persisted
+    periodically, so a restart does not make the chronically failing tokens look healthy again.
+    """
+
+    def __init__(self, repository: TokenHealthRepository, token_health_settings: TokenHealthSettings,
+                 clock: Callable[[], float] = time.time) -> None:
+        self._repository = repository
+        self._settings = token_health_settings
+        self._clock = clock
+        self._health: Dict[int, _TokenHealth] = {}
+        self._dirty: Set[int] = set()
+
+    async def load(self) -> None:
+        """Restore the persisted stats; a failure leaves every token with the healthy defaults."""
+        try:
+            stats: List[Dict[str, Any]] = await self._repository.get_all_stats()
+        except Exception as e:
+            logger.error("Failed to load token health stats, starting from scratch.", error=str(e))
+            return
+
+        for row in stats:
+            health = self._get_health(row['token_id'])
+            health.success_ratio = row['success_ratio']
+            health.latency_seconds = row['latency_seconds']
+            health.time_to_rate_limit_seconds = row['time_to_rate_limit_seconds']
+            health.successes = row['successes']
+            health.rate_limits = row['rate_limits']
+            health.errors = row['errors']
+            health.observations = row['observations']
+            health.quarantines = row['quarantines']
+        logger.info(f"Token health stats loaded ({len(stats)} tokens).")
+
+    async def persist(self) -> None:
+        """Save the stats changed since the last call; on a failure they are retried on the next one."""
+        dirty, self._dirty = self._dirty, set()
+        stats: List[Dict[str, Any]] = [
+            self._to_row(token_id, self._health[token_id]) for token_id in dirty if token_id in self._health]
+        if not stats:
+            return
+
+        try:
+            await self._repository.save_stats(stats)
+        except Exception as e:
+            self._dirty |= dirty
+            logger.error(f"Failed to persist health stats of {len(stats)} tokens.", error=str(e))
+
+    def record_success(self, token_id: int, latency_seconds: Optional[float]) -> None:
+        health = self._get_health(token_id)
+        health.success_ratio = self._ewma(health.success_ratio, 1.0)
+        if latency_seconds is not None:
+            health.latency_seconds = latency_seconds if health.latency_seconds is None \
+                else self._ewma(health.latency_seconds, latency_seconds)
+        health.successes += 1
+        health.observations += 1
+        self._dirty.add(token_id)
+
+    def record_rate_limited(self, token_id: int) -> None:
+        health = self._get_health(token_id)
+        if health.available_since is not None:
+            time_to_rate_limit = max(self._clock() - health.available_since, 0.0)
+            health.time_to_rate_limit_seconds = time_to_rate_limit if health.time_to_rate_limit_seconds is None \
+                else self._ewma(health.time_to_rate_limit_seconds, time_to_rate_limit)
+            # Only the first 429 after the unlock tells how long the token lasts.
+            health.available_since = None
+        health.rate_limits += 1
+        self._dirty.add(token_id)
+
+    def record_error(self, token_id: int) -> None:
+        """A request failed because of the token itself, e.g. it got revoked or ran out of credits."""
+        health = self._get_health(token_id)
+        health.success_ratio = self._ewma(health.success_ratio, 0.0)
+        health.errors += 1
+        health.observations += 1
+        self._dirty.add(token_id)
+
+    def mark_available(self, token_id: int) -> None:
+        health = self._get_health(token_id)
+        if health.available_since is None:
+            health.available_since = self._clock()
+
+    def mark_locked(self, token_id: int) -> None:
+        health: Optional[_TokenHealth] = self._health.get(token_id)
+        if health is not None:
+            health.available_since = None
+
+    def forget(self, token_id: int) -> None:
+        self._health.pop(token_id, None)
+        self._dirty.discard(token_id)
+
+    def score(self, token_id: int) -> float:
+        """Health score in [min_score, 1], 1 for the tokens never observed."""
+        health: Optional[_TokenHealth] = self._health.get(token_id)
+        if health is None:
+            return 1.0
+
+        score: float = health.success_ratio
+        if health.time_to_rate_limit_seconds is not None:
+            reference: float = self._settings.reference_time_to_rate_limit_seconds
+            score *= health.time_to_rate_limit_seconds / (health.time_to_rate_limit_seconds + reference)
+        return max(score, self._settings.min_score)
+
+    def quarantine_until(self, token_id: int) -> Optional[float]:
+        """UNIX time to keep the token locked until if it is chronically failing, None otherwise."""
+        health: Optional[_TokenHealth] = self._health.get(token_id)
+        if (health is None or health.observations < self._settings.quarantine_min_observations
+                or health.success_ratio >= self._settings.quarantine_success_ratio_threshold):
+            return None
+        return self._clock() + self._settings.quarantine_seconds
+
+    def record_quarantine(self, token_id: int) -> None:
+        """The token got locked for the quarantine; it is judged anew once back."""
+        health = self._get_health(token_id)
+        health.observations = 0
+        health.quarantines += 1
+        self._dirty.add(token_id)
+
+    def get_stats(self, limit: int) -> List[Dict[str, Any]]:
+        """Stats of the least healthy tokens first."""
+        token_ids: List[int] = sorted(self._health, key=self.score)[:limit]
+        return [
+            {**self._to_row(token_id, self._health[token_id]), 'score': round(self.score(token_id), 4)}
+            for token_id in token_ids]
+
+    def _get_health(self, token_id: int) -> _TokenHealth:
+        health: Optional[_TokenHealth] = self._health.get(token_id)
+        if health is None:
+            health = self._health[token_id] = _TokenHealth()
+        return health
+
+    def _ewma(self, average: float, value: float) -> float:
+        return average + self._settings.ewma_alpha * (value - average)
+
+    @staticmethod
+    def _to_row(token_id: int, health: _TokenHealth) -> Dict[str, Any]:
+        return {
+            'token_id': token_id, 'success_ratio': health.success_ratio, 'latency_seconds': health.latency_seconds,
+            'time_to_rate_limit_seconds': health.time_to_rate_limit_seconds, 'successes': health.successes,
+            'rate_limits': health.rate_limits, 'errors': health.errors, 'observations': health.observations,
+            'quarantines': health.quarantines}
+
+
+token_health_tracker = TokenHealthTracker(token_health_repository, settings.token_health)
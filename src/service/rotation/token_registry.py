@@ -0,0 +1,244 @@
+import heapq
+import itertools
+import random
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.config.settings import TokenLeaseSettings
+from src.model.api_provider import ApiProvider
+from src.model.api_token import ApiToken
+from src.model.rate_limit_state import RateLimitState
+from src.model.token_lease import TokenLease
+from src.model.token_selection_strategy import TokenSelectionStrategy
+from src.service.rotation.token_bucket import TokenBucket
+from src.service.rotation.token_health_tracker import TokenHealthTracker
+from src.util.fenwick_tree import FenwickTree
+
+# Health scores are turned into integer lease weights with this precision.
+_WEIGHT_SCALE = 1000
+
+
+class TokenRegistry:
+    """In-memory registry of the non-locked tokens, grouped by API provider.
+
+    Tokens are kept in a list per provider together with an index of their positions,
+    so that picking a random token and removing a token are both O(1). Besides, the registry
+    counts the leases in flight per token to spread the concurrent requests over the tokens,
+    and keeps a rate-limit bucket per token to pause it before the provider starts answering 429.
+
+    Every token has a lease weight, its health score over the leases in flight, or 0 while it is
+    at the concurrency cap or paused. The weights sit in a Fenwick tree in the order of the list,
+    so the health-weighted and the round-robin strategies find their token in O(log n) with any
+    number of tokens; least-loaded still scans them. The weights are updated on every change of
+    a token, and the paused tokens are put back once their window resets through a heap of reset times.
+    """
+
+    def __init__(self, token_lease_settings: TokenLeaseSettings, health_tracker: TokenHealthTracker,
+                 clock: Callable[[], float] = time.time) -> None:
+        self._settings = token_lease_settings
+        self._health_tracker = health_tracker
+        self._clock = clock
+        self._tokens: Dict[ApiProvider, List[ApiToken]] = {api_provider: [] for api_provider in ApiProvider}
+        self._positions: Dict[int, int] = {}
+        self._providers: Dict[int, ApiProvider] = {}
+        self._in_flight: Dict[int, int] = {}
+        self._epochs: Dict[int, int] = {}
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._weights: Dict[ApiProvider, FenwickTree] = {api_provider: FenwickTree() for api_provider in ApiProvider}
+        self._resets: Dict[ApiProvider, List[Tuple[float, int]]] = {api_provider: [] for api_provider in ApiProvider}
+        self._in_flight_totals: Dict[ApiProvider, int] = {api_provider: 0 for api_provider in ApiProvider}
+        self._epoch_sequence = itertools.count(1)
+        self._round_robin_cursors: Dict[ApiProvider, int] = {api_provider: 0 for api_provider in ApiProvider}
+        self._is_loaded: bool = False
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._is_loaded
+
+    def load(self, tokens: List[ApiToken]) -> None:
+        self._clear()
+        for token in tokens:
+            self.put(token)
+        self._is_loaded = True
+
+    def invalidate(self) -> None:
+        self._clear()
+        self._is_loaded = False
+
+    def put(self, token: ApiToken) -> None:
+        position: Optional[int] = self._positions.get(token.token_id)
+        if position is not None:
+            # Still the same non-locked period, only the token itself is refreshed.
+            self._tokens[token.api_provider][position] = token
+            return
+
+        provider_tokens = self._tokens[token.api_provider]
+        self._positions[token.token_id] = len(provider_tokens)
+        self._providers[token.token_id] = token.api_provider
+        self._in_flight[token.token_id] = 0
+        self._epochs[token.token_id] = next(self._epoch_sequence)
+        self._buckets[token.token_id] = TokenBucket()
+        provider_tokens.append(token)
+        self._weights[token.api_provider].append(self._weight(token.token_id, self._clock()))
+
+    def remove(self, token_id: int) -> None:
+        position: Optional[int] = self._positions.pop(token_id, None)
+        if position is None:
+            return
+
+        api_provider: ApiProvider = self._providers.pop(token_id)
+        self._in_flight_totals[api_provider] -= self._in_flight.pop(token_id)
+        self._epochs.pop(token_id)
+        self._buckets.pop(token_id)
+        provider_tokens = self._tokens[api_provider]
+        weights = self._weights[api_provider]
+        last_token = provider_tokens.pop()
+        last_weight = weights.pop()
+        if last_token.token_id != token_id:
+            provider_tokens[position] = last_token
+            self._positions[last_token.token_id] = position
+            weights.set(position, last_weight)
+
+    def contains(self, lease: TokenLease) -> bool:
+        """Whether the leased token is still non-locked within the same period it was leased in."""
+        return self._epochs.get(lease.api_token.token_id) == lease.epoch
+
+    def get_random(self, api_provider: ApiProvider) -> Optional[ApiToken]:
+        provider_tokens = self._tokens[api_provider]
+        return random.choice(provider_tokens) if provider_tokens else None
+
+    def acquire(self, api_provider: ApiProvider) -> Optional[TokenLease]:
+        """Lease a token that is neither at the concurrency cap nor paused, None if there is no such token."""
+        now = self._clock()
+        self._resume_due(api_provider, now)
+        if self._settings.selection_strategy == TokenSelectionStrategy.ROUND_ROBIN:
+            token = self._find_next_in_round(api_provider)
+        elif self._settings.selection_strategy == TokenSelectionStrategy.HEALTH_WEIGHTED:
+            token = self._find_health_weighted(api_provider)
+        else:
+            token = self._find_least_loaded(api_provider, now)
+
+        if token is None:
+            return None
+
+        self._in_flight[token.token_id] += 1
+        self._in_flight_totals[api_provider] += 1
+        self._buckets[token.token_id].consume(now)
+        self._update_weight(token.token_id, now)
+        return TokenLease(token, self._epochs[token.token_id])
+
+    def release(self, lease: TokenLease) -> None:
+        if self.contains(lease):
+            token_id = lease.api_token.token_id
+            self._in_flight[token_id] -= 1
+            self._in_flight_totals[self._providers[token_id]] -= 1
+            self._update_weight(token_id, self._clock())
+
+    def update_rate_limit(self, lease: TokenLease, state: RateLimitState) -> None:
+        if not self.contains(lease):
+            return
+
+        token_id = lease.api_token.token_id
+        bucket: TokenBucket = self._buckets[token_id]
+        previous_reset_at: Optional[float] = bucket.reset_at
+        bucket.update(state)
+        if bucket.reset_at is not None and bucket.reset_at != previous_reset_at:
+            heapq.heappush(self._resets[self._providers[token_id]], (bucket.reset_at, token_id))
+        self._update_weight(token_id, self._clock())
+
+    def refresh(self, token_id: int) -> None:
+        """Re-weight the token after its health score has changed."""
+        if token_id in self._positions:
+            self._update_weight(token_id, self._clock())
+
+    def seconds_until_resume(self, api_provider: ApiProvider) -> Optional[float]:
+        """Time left until the first paused token of the provider gets its window reset, None if none is paused."""
+        now = self._clock()
+        self._resume_due(api_provider, now)
+        resets = self._resets[api_provider]
+        while resets and self._is_stale_reset(*resets[0]):
+            heapq.heappop(resets)
+        return resets[0][0] - now if resets else None
+
+    def size(self, api_provider: ApiProvider) -> int:
+        return len(self._tokens[api_provider])
+
+    def in_flight(self, api_provider: ApiProvider) -> int:
+        return self._in_flight_totals[api_provider]
+
+    def _is_available(self, token_id: int, now: float) -> bool:
+        return (self._in_flight[token_id] < self._settings.max_concurrency_per_token
+                and not self._buckets[token_id].is_paused(now, self._settings.rate_limit_reserve))
+
+    def _find_least_loaded(self, api_provider: ApiProvider, now: float) -> Optional[ApiToken]:
+        provider_tokens = self._tokens[api_provider]
+        if not provider_tokens:
+            return None
+
+        # Scanning from a random offset spreads the ties over the tokens.
+        offset = random.randrange(len(provider_tokens))
+        least_loaded: Optional[ApiToken] = None
+        for i in range(len(provider_tokens)):
+            token = provider_tokens[(offset + i) % len(provider_tokens)]
+            if not self._is_available(token.token_id, now):
+                continue
+            in_flight = self._in_flight[token.token_id]
+            if in_flight == 0:
+                return token
+            if least_loaded is None or in_flight < self._in_flight[least_loaded.token_id]:
+                least_loaded = token
+        return least_loaded
+
+    def _find_health_weighted(self, api_provider: ApiProvider) -> Optional[ApiToken]:
+        weights = self._weights[api_provider]
+        total = weights.total()
+        if total == 0:
+            return None
+        return self._tokens[api_provider][weights.find(random.randrange(total))]
+
+    def _find_next_in_round(self, api_provider: ApiProvider) -> Optional[ApiToken]:
+        # The first token with a non-zero weight from the cursor on, wrapping around to the start.
+        weights = self._weights[api_provider]
+        total = weights.total()
+        if total == 0:
+            return None
+
+        skipped = weights.prefix_sum(min(self._round_robin_cursors[api_provider], len(weights)))
+        position = weights.find(skipped if skipped < total else 0)
+        self._round_robin_cursors[api_provider] = position + 1
+        return self._tokens[api_provider][position]
+
+    def _weight(self, token_id: int, now: float) -> int:
+        # The busier tokens are leased less often, just as the less healthy ones.
+        if not self._is_available(token_id, now):
+            return 0
+        score: float = self._health_tracker.score(token_id)
+        return max(round(score * _WEIGHT_SCALE / (1 + self._in_flight[token_id])), 1)
+
+    def _update_weight(self, token_id: int, now: float) -> None:
+        self._weights[self._providers[token_id]].set(self._positions[token_id], self._weight(token_id, now))
+
+    def _resume_due(self, api_provider: ApiProvider, now: float) -> None:
+        resets = self._resets[api_provider]
+        while resets and resets[0][0] <= now:
+            reset_at, token_id = heapq.heappop(resets)
+            if not self._is_stale_reset(reset_at, token_id):
+                self._update_weight(token_id, now)
+
+    def _is_stale_reset(self, reset_at: float, token_id: int) -> bool:
+        """Whether the token is gone or its bucket has got another reset time since."""
+        bucket: Optional[TokenBucket] = self._buckets.get(token_id)
+        return bucket is None or bucket.reset_at != reset_at
+
+    def _clear(self) -> None:
+        for provider_tokens in self._tokens.values():
+            provider_tokens.clear()
+        self._positions.clear()
+        self._providers.clear()
+        self._in_flight.clear()
+        self._epochs.clear()
+        self._buckets.clear()
+        for api_provider in ApiProvider:
+            self._weights[api_provider].clear()
+            self._resets[api_provider].clear()
+            self._in_flight_totals[api_provider] = 0
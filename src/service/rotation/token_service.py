@@ -1,20 +1,101 @@
-from typing import Dict, Optional, Any, List
+import asyncio
+import functools
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Any, List, Tuple
 
-from src.mapping.api_token_mapper import map_api_token_dict_to_api_token
+import asyncpg
+import backoff
+
+from src.config.settings import settings, TokenLeaseSettings
+from src.mapping.api_token_mapper import map_api_token_dict_to_api_token, map_api_token_dict_to_lazy_api_token
+from src.metrics.metrics import TOKEN_LEASE_WAIT, TOKEN_LEASE_TIMEOUTS, TOKEN_LOCKS, TOKEN_UNLOCKS, TOKEN_QUARANTINES
 from src.model.api_provider import ApiProvider
 from src.model.api_token import ApiToken
+from src.model.rate_limit_state import RateLimitState
+from src.model.token_lease import TokenLease
 from src.repository.token_repository import TokenRepository, token_repository
+from src.service.rotation.token_decryption_cache import TokenDecryptionCache
 from src.service.rotation.token_encryptor import token_encryptor, TokenEncryptor
+from src.service.rotation.token_health_tracker import TokenHealthTracker, token_health_tracker
+from src.service.rotation.token_registry import TokenRegistry
+from src.service.rotation.token_unlock_scheduler import TokenUnlockScheduler
 from src.util.logger import get_logger
+from src.util.request_timing import record_stage, stage_timer
 
 
 logger = get_logger(__name__)
 
+_REGISTRY_RESTART_MAX_TIME_SECONDS = 300
+
+
 class TokenService:
 
-    def __init__(self, repository: TokenRepository, encryptor: TokenEncryptor) -> None:
+    def __init__(self, repository: TokenRepository, encryptor: TokenEncryptor, decryption_cache: TokenDecryptionCache,
+                 registry: TokenRegistry, health_tracker: TokenHealthTracker, token_lease_settings: TokenLeaseSettings,
+                 clock: Callable[[], float] = time.time) -> None:
         self._repository = repository
         self._encryptor = encryptor
+        self._decryption_cache = decryption_cache
+        self._registry = registry
+        self._health_tracker = health_tracker
+        self._token_lease_settings = token_lease_settings
+        self._lease_conditions: Dict[ApiProvider, asyncio.Condition] = {
+            api_provider: asyncio.Condition() for api_provider in ApiProvider}
+        self._listener_connection: Optional[asyncpg.Connection] = None
+        self._pending_changes: Optional[List[Dict[str, Any]]] = None
+        self._restart_task: Optional[asyncio.Task] = None
+        self._unlock_scheduler = TokenUnlockScheduler(self._unlock_on_schedule, clock)
+
+    async def start_registry(self) -> None:
+        """Load the non-locked tokens into memory and keep them fresh via the tokens changes channel.
+
+        The subscription is opened before the snapshot is read; changes received meanwhile are
+        buffered and replayed on top of the snapshot, so no change is lost in between.
+        """
+        self._pending_changes = []
+        try:
+            self._listener_connection = await self._repository.listen_changes(
+                self._on_token_change, self._on_listener_termination)
+
+            tokens_info: List[Dict[str, Any]] = await self._repository.get_non_locked_tokens()
+            for token_info in tokens_info:
+                self._health_tracker.mark_available(token_info['id'])
+            self._registry.load([
+                map_api_token_dict_to_api_token(token_info, self._decrypt(token_info))
+                for token_info in tokens_info])
+
+            for change in self._pending_changes:
+                self._apply_token_change(change)
+        except Exception:
+            await self.stop_registry()
+            raise
+        finally:
+            self._pending_changes = None
+
+        logger.info(f"Tokens registry loaded ({len(tokens_info)} non-locked tokens).")
+
+    async def stop_registry(self) -> None:
+        if self._restart_task is not None and self._restart_task is not asyncio.current_task():
+            self._restart_task.cancel()
+        self._restart_task = None
+
+        listener_connection, self._listener_connection = self._listener_connection, None
+        self._registry.invalidate()
+        if listener_connection is not None:
+            await self._repository.stop_listening(listener_connection)
+
+    async def start_unlock_scheduler(self) -> None:
+        """Schedule the unlock of every locked token with a known recovery time, including the overdue ones."""
+        scheduled_unlocks: List[Tuple[int, ApiProvider, datetime]] = await self._repository.get_scheduled_unlocks()
+        for token_id, api_provider, unlock_at in scheduled_unlocks:
+            self._unlock_scheduler.schedule(token_id, api_provider, unlock_at.timestamp())
+        self._unlock_scheduler.start()
+
+        logger.info(f"Tokens unlock scheduler started ({len(scheduled_unlocks)} scheduled unlocks).")
+
+    async def stop_unlock_scheduler(self) -> None:
+        await self._unlock_scheduler.stop()
 
     async def get_by_id(self, token_id: int) -> Optional[ApiToken]:
         token_info: Optional[Dict[str, Any]] = await self._repository.get_by_id(token_id)
@@ -23,10 +104,16 @@ class TokenService:
             logger.warning(f"Token not found for id={token_id}")
             return None
 
-        token_value = self._encryptor.decrypt(token_info['token_encrypted'])
+        token_value = self._decrypt(token_info)
         return map_api_token_dict_to_api_token(token_info, token_value)
 
     async def get_random_by_api_provider(self, api_provider: ApiProvider) -> Optional[ApiToken]:
+        if self._registry.is_loaded:
+            api_token: Optional[ApiToken] = self._registry.get_random(api_provider)
+            if api_token is None:
+                logger.warning(f"Token not found for {api_provider}")
+            return api_token
+
         token_info: Optional[Dict[str, Any]] =\
             await self._repository.get_random_non_locked_by_api_provider(api_provider)
 
@@ -34,19 +121,85 @@ class TokenService:
             logger.warning(f"Token not found for {api_provider}")
             return None
 
-        token_value = self._encryptor.decrypt(token_info['token_encrypted'])
+        token_value = self._decrypt(token_info)
         return map_api_token_dict_to_api_token(token_info, token_value)
 
+    async def lease(self, api_provider: ApiProvider) -> Optional[TokenLease]:
+        """Lease a non-locked token for a single request, waiting while all of them are busy or paused."""
+        if not self._registry.is_loaded:
+            api_token: Optional[ApiToken] = await self.get_random_by_api_provider(api_provider)
+            return TokenLease(api_token, None) if api_token else None
+
+        lease: Optional[TokenLease] = None
+        loop = asyncio.get_running_loop()
+        started_at = loop.time()
+        deadline = started_at + self._token_lease_settings.lease_timeout_seconds
+
+        condition: asyncio.Condition = self._lease_conditions[api_provider]
+        async with condition:
+            while self._registry.size(api_provider) > 0:
+                lease = self._registry.acquire(api_provider)
+                if lease is not None:
+                    break
+
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    logger.warning(f"All tokens for {api_provider} stayed busy or paused, no token leased.")
+                    TOKEN_LEASE_TIMEOUTS.labels(api_provider.value).inc()
+                    break
+
+                # Woken up by a released lease, or when the first paused token gets its window reset.
+                seconds_until_resume: Optional[float] = self._registry.seconds_until_resume(api_provider)
+                if seconds_until_resume is not None:
+                    timeout = min(timeout, seconds_until_resume)
+                try:
+                    await asyncio.wait_for(condition.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+        TOKEN_LEASE_WAIT.labels(api_provider.value).observe(loop.time() - started_at)
+        record_stage("token_lease", loop.time() - started_at)
+        if lease is None:
+            logger.warning(f"Token not found for {api_provider}")
+        return lease
+
+    async def release(self, lease: TokenLease) -> None:
+        self._registry.release(lease)
+
+        condition: asyncio.Condition = self._lease_conditions[lease.api_token.api_provider]
+        async with condition:
+            condition.notify()
+
+    def update_rate_limit(self, lease: TokenLease, state: RateLimitState) -> None:
+        self._registry.update_rate_limit(lease, state)
+
+    def record_success(self, lease: TokenLease, latency_seconds: Optional[float]) -> None:
+        self._health_tracker.record_success(lease.api_token.token_id, latency_seconds)
+        self._registry.refresh(lease.api_token.token_id)
+
+    def record_rate_limited(self, lease: TokenLease) -> None:
+        self._health_tracker.record_rate_limited(lease.api_token.token_id)
+        self._registry.refresh(lease.api_token.token_id)
+
+    def record_error(self, lease: TokenLease) -> None:
+        self._health_tracker.record_error(lease.api_token.token_id)
+        self._registry.refresh(lease.api_token.token_id)
+
+    async def lock_leased(self, lease: TokenLease, unlock_at: Optional[float] = None) -> None:
+        """Lock the leased token, unless a concurrent request has already locked it."""
+        if lease.epoch is not None and not self._registry.contains(lease):
+            logger.info(f"Token [id={lease.api_token.token_id}] is already locked, skipping.")
+            return
+
+        await self.lock(lease.api_token.token_id, unlock_at)
+
     async def get_locked_tokens(self) -> List[ApiToken]:
         locked_tokens_info: List[Dict[str, Any]] = await self._repository.get_locked_tokens()
+        return self._map_locked_tokens(locked_tokens_info)
 
-        if not locked_tokens_info:
-            logger.info(f"No locked tokens found.")
-            return []
-
-        return [
-            map_api_token_dict_to_api_token(token_info, self._encryptor.decrypt(token_info["token_encrypted"]))
-            for token_info in locked_tokens_info]
+    async def get_locked_tokens_due_for_check(self) -> List[ApiToken]:
+        locked_tokens_info: List[Dict[str, Any]] = await self._repository.get_locked_tokens_due_for_check()
+        return self._map_locked_tokens(locked_tokens_info)
 
     async def save(self, token: str, api_provider: ApiProvider) -> Optional[int]:
         encrypted_token: str = self._encryptor.encrypt(token)
@@ -59,22 +212,156 @@ class TokenService:
         rotated_token: ApiToken = await self.get_random_by_api_provider(api_provider)
         return rotated_token.value
 
-    async def lock(self, token_id: int):
-        success = await self._repository.lock_token(token_id)
-        if success:
-            logger.info(f"Token [id={token_id}] locked successfully.")
+    async def lock(self, token_id: int, unlock_at: Optional[float] = None):
+        """Lock the token; with unlock_at (UNIX time) given, it gets unlocked back at that time.
+
+        A chronically failing token is quarantined instead, i.e. kept locked for the quarantine at least.
+        """
+        quarantine_until: Optional[float] = self._health_tracker.quarantine_until(token_id)
+        if quarantine_until is not None:
+            unlock_at = max(unlock_at or 0.0, quarantine_until)
+
+        api_provider: Optional[ApiProvider] = await self._repository.lock_token(
+            token_id, datetime.fromtimestamp(unlock_at, tz=timezone.utc) if unlock_at is not None else None)
+        # Applied once the DB has taken it, a failed UPDATE leaves the token usable; the NOTIFY event confirms it.
+        self._registry.remove(token_id)
+        self._health_tracker.mark_locked(token_id)
+        if api_provider is not None:
+            TOKEN_LOCKS.inc()
+            if quarantine_until is not None:
+                logger.warning(f"Token [id={token_id}] is chronically failing, quarantined.", unlock_at=unlock_at)
+                TOKEN_QUARANTINES.inc()
+                self._health_tracker.record_quarantine(token_id)
+            if unlock_at is not None:
+                self._unlock_scheduler.schedule(token_id, api_provider, unlock_at)
+            logger.info(f"Token [id={token_id}] locked successfully.", unlock_at=unlock_at)
         else:
             logger.warn(f"Token [id={token_id}] was already locked or does not exist.")
 
     async def unlock(self, token_id: int) -> None:
+        self._unlock_scheduler.cancel(token_id)
         success = await self._repository.unlock_token(token_id)
         if success:
+            TOKEN_UNLOCKS.inc()
             logger.info(f"Token [id={token_id}] unlocked successfully.")
         else:
             logger.warn(f"Token [id={token_id}] was already unlocked or does not exist.")
 
+    async def unlock_many(self, token_ids: List[int]) -> List[int]:
+        """Unlock all the given tokens with a single statement, returns the ids actually unlocked."""
+        if not token_ids:
+            return []
+
+        for token_id in token_ids:
+            self._unlock_scheduler.cancel(token_id)
+        unlocked_ids: List[int] = await self._repository.unlock_tokens(token_ids)
+        TOKEN_UNLOCKS.inc(len(unlocked_ids))
+        logger.info(f"Tokens {unlocked_ids} unlocked successfully.")
+        return unlocked_ids
+
+    async def count_locked_tokens(self) -> Dict[ApiProvider, int]:
+        return await self._repository.count_locked_tokens()
+
+    def count_available(self, api_provider: ApiProvider) -> int:
+        """Non-locked tokens known to the registry, 0 while it is not loaded."""
+        return self._registry.size(api_provider)
+
+    def count_in_flight(self, api_provider: ApiProvider) -> int:
+        return self._registry.in_flight(api_provider)
+
+    def count_scheduled_unlocks(self) -> int:
+        return self._unlock_scheduler.size()
+
+    def next_unlock_at(self, api_provider: ApiProvider) -> Optional[float]:
+        """UNIX time of the earliest scheduled unlock of a token of the provider, None if none is scheduled."""
+        return self._unlock_scheduler.next_unlock_at(api_provider)
+
     async def delete(self, token_id: int) -> None:
         await self._repository.delete_token_by_id(token_id)
+        self._registry.remove(token_id)
+        self._unlock_scheduler.cancel(token_id)
+        self._decryption_cache.evict(token_id)
+        self._health_tracker.forget(token_id)
+
+    def _decrypt(self, token_info: Dict[str, Any]) -> str:
+        token_encrypted: str = token_info['token_encrypted']
+        token_value: Optional[str] = self._decryption_cache.get(token_info['id'], token_encrypted)
+        if token_value is None:
+            with stage_timer("decrypt"):
+                token_value = self._encryptor.decrypt(token_encrypted)
+            self._decryption_cache.put(token_info['id'], token_encrypted, token_value)
+        return token_value
+
+    def _map_locked_tokens(self, locked_tokens_info: List[Dict[str, Any]]) -> List[ApiToken]:
+        if not locked_tokens_info:
+            logger.info(f"No locked tokens found.")
+            return []
+
+        # Decrypted on the first access to the value only, most of them are never probed.
+        return [
+            map_api_token_dict_to_lazy_api_token(token_info, functools.partial(self._decrypt, token_info))
+            for token_info in locked_tokens_info]
+
+    def _on_token_change(self, change: Dict[str, Any]) -> None:
+        if self._pending_changes is not None:
+            self._pending_changes.append(change)
+            return
+
+        try:
+            self._apply_token_change(change)
+        except Exception as e:
+            logger.error(f"Failed to apply change of Token (id={change.get('id')}) to the registry.", error=str(e))
+            self._registry.remove(change.get('id'))
+
+    def _apply_token_change(self, change: Dict[str, Any]) -> None:
+        if change['operation'] == 'DELETE':
+            self._registry.remove(change['id'])
+            self._unlock_scheduler.cancel(change['id'])
+            self._decryption_cache.evict(change['id'])
+            self._health_tracker.forget(change['id'])
+            return
+
+        if change['locked']:
+            self._registry.remove(change['id'])
+            self._health_tracker.mark_locked(change['id'])
+            # Tokens locked by the other replicas get unlocked on time here as well.
+            if change.get('unlock_at') is not None:
+                self._unlock_scheduler.schedule(
+                    change['id'], ApiProvider(change['api_provider']), float(change['unlock_at']))
+            return
+
+        self._unlock_scheduler.cancel(change['id'])
+        self._health_tracker.mark_available(change['id'])
+        token_value = self._decrypt(change)
+        self._registry.put(map_api_token_dict_to_api_token(change, token_value))
+
+    def _on_listener_termination(self) -> None:
+        if self._listener_connection is None:
+            # The subscription has been closed on purpose.
+            return
+
+        logger.warning("Tokens changes subscription lost, falling back to DB token selection until restored.")
+        self._listener_connection = None
+        self._registry.invalidate()
+        self._restart_task = asyncio.get_running_loop().create_task(self._restart_registry())
+
+    async def _unlock_on_schedule(self, token_id: int) -> None:
+        logger.info(f"Token [id={token_id}] reached its expected recovery time.")
+        await self.unlock(token_id)
+
+    async def _restart_registry(self) -> None:
+        retryable = backoff.on_exception(
+            backoff.expo, Exception, max_time=_REGISTRY_RESTART_MAX_TIME_SECONDS)(self.start_registry)
+        try:
+            await retryable()
+        except Exception as e:
+            logger.error("Failed to restore tokens registry, DB token selection stays in use.", error=str(e))
 
 
-token_service = TokenService(token_repository, token_encryptor)
+token_service = TokenService(
+    token_repository,
+    token_encryptor,
+    TokenDecryptionCache(settings.token_decryption_cache.max_size, settings.token_decryption_cache.ttl_seconds),
+    TokenRegistry(settings.token_lease, token_health_tracker),
+    token_health_tracker,
+    settings.token_lease)
@@ -0,0 +1,93 @@
+import asyncio
+import heapq
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from src.model.api_provider import ApiProvider
+from src.util.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class TokenUnlockScheduler:
+    """Timer heap firing the unlock of every locked token at its expected recovery time.
+
+    Rescheduled and cancelled tokens are not removed from the heap right away; their stale
+    entries are recognized against the latest schedule and skipped when they surface.
+    """
+
+    def __init__(self, on_due: Callable[[int], Awaitable[None]], clock: Callable[[], float] = time.time) -> None:
+        self._on_due = on_due
+        self._clock = clock
+        self._heap: List[Tuple[float, int]] = []
+        self._scheduled: Dict[int, float] = {}
+        self._api_providers: Dict[int, ApiProvider] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def schedule(self, token_id: int, api_provider: ApiProvider, unlock_at: float) -> None:
+        self._api_providers[token_id] = api_provider
+        if self._scheduled.get(token_id) == unlock_at:
+            return
+
+        self._scheduled[token_id] = unlock_at
+        heapq.heappush(self._heap, (unlock_at, token_id))
+        self._wakeup.set()
+
+    def cancel(self, token_id: int) -> None:
+        self._scheduled.pop(token_id, None)
+        self._api_providers.pop(token_id, None)
+
+    def size(self) -> int:
+        return len(self._scheduled)
+
+    def next_unlock_at(self, api_provider: ApiProvider) -> Optional[float]:
+        """The earliest scheduled unlock of a token of the provider, None if none is scheduled.
+
+        Scans the scheduled unlocks; it is only looked up when a job gets postponed.
+        """
+        return min(
+            (unlock_at for token_id, unlock_at in self._scheduled.items()
+             if self._api_providers.get(token_id) == api_provider),
+            default=None)
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            timeout: Optional[float] = None
+
+            while self._heap:
+                unlock_at, token_id = self._heap[0]
+                if self._scheduled.get(token_id) != unlock_at:
+                    heapq.heappop(self._heap)
+                    continue
+
+                delay = unlock_at - self._clock()
+                if delay > 0:
+                    timeout = delay
+                    break
+
+                heapq.heappop(self._heap)
+                del self._scheduled[token_id]
+                self._api_providers.pop(token_id, None)
+                try:
+                    await self._on_due(token_id)
+                except Exception as e:
+                    logger.error(f"Failed to unlock Token (id={token_id}) on schedule.", error=str(e))
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,69 @@
+from typing import List
+
+
+class FenwickTree:
+    """Binary indexed tree over a growable list of non-negative integer weights.
+
+    Setting a weight, summing a prefix and finding the position a cumulative weight falls at
+    are all O(log n). The weights are integers, so the sums never drift with the updates.
+    """
+
+    def __init__(self) -> None:
+        # 1-based tree: node i holds the sum of the weights at positions (i - lowbit(i), i].
+        self._tree: List[int] = [0]
+        self._weights: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._weights)
+
+    def append(self, weight: int) -> None:
+        self._weights.append(weight)
+        index = len(self._weights)
+        lowbit = index & -index
+        self._tree.append(weight + self.prefix_sum(index - 1) - self.prefix_sum(index - lowbit))
+
+    def pop(self) -> int:
+        """Remove the last weight; the nodes of the remaining positions never cover it."""
+        self._tree.pop()
+        return self._weights.pop()
+
+    def get(self, position: int) -> int:
+        return self._weights[position]
+
+    def set(self, position: int, weight: int) -> None:
+        delta = weight - self._weights[position]
+        if delta == 0:
+            return
+
+        self._weights[position] = weight
+        index = position + 1
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def prefix_sum(self, count: int) -> int:
+        """Sum of the first count weights."""
+        total = 0
+        while count > 0:
+            total += self._tree[count]
+            count -= count & -count
+        return total
+
+    def total(self) -> int:
+        return self.prefix_sum(len(self._weights))
+
+    def find(self, target: int) -> int:
+        """The first position whose prefix sum, itself included, exceeds target; target must be below total()."""
+        index = 0
+        step = 1 << (len(self._weights).bit_length() - 1) if self._weights else 0
+        while step > 0:
+            next_index = index + step
+            if next_index < len(self._tree) and self._tree[next_index] <= target:
+                index = next_index
+                target -= self._tree[next_index]
+            step >>= 1
+        return index
+
+    def clear(self) -> None:
+        self._tree = [0]
+        self._weights = []
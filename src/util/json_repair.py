@@ -0,0 +1,32 @@
+import json
+import re
+from typing import Any, Dict, Optional
+
+_THINKING_PATTERN = re.compile(r"<think>.*?</think>", re.DOTALL)
+_FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+_TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
+
+
+def extract_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """Extract the JSON object out of a model output, None if there is no parsable object in it.
+
+    Handles the usual ways the models break the JSON: reasoning blocks and prose around it,
+    markdown code fences, and trailing commas.
+    """
+    text = _THINKING_PATTERN.sub("", text)
+    fence = _FENCE_PATTERN.search(text)
+    if fence is not None:
+        text = fence.group(1)
+
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        return None
+
+    candidate: str = text[start:end + 1]
+    for attempt in (candidate, _TRAILING_COMMA_PATTERN.sub(r"\1", candidate)):
+        try:
+            value = json.loads(attempt)
+        except json.JSONDecodeError:
+            continue
+        return value if isinstance(value, dict) else None
+    return None
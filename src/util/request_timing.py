@@ -0,0 +1,68 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+
+class RequestTimings:
+    """Time spent per stage of a single request, summed over all the stage runs.
+
+    Work done concurrently on behalf of the request, e.g. the events of a batch, is summed up as well,
+    so a stage may add up to more than the request itself took.
+    """
+
+    def __init__(self) -> None:
+        self.started_at: float = time.perf_counter()
+        self.stages: Dict[str, List[float]] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        totals: Optional[List[float]] = self.stages.get(stage)
+        if totals is None:
+            self.stages[stage] = [seconds, 1]
+        else:
+            totals[0] += seconds
+            totals[1] += 1
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def to_server_timing(self) -> str:
+        metrics: List[str] = [
+            f'{stage};dur={seconds * 1000:.1f};desc="x{count:.0f}"' for stage, (seconds, count) in self.stages.items()]
+        metrics.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(metrics)
+
+    def to_log_dict(self) -> Dict[str, Dict[str, float]]:
+        return {
+            stage: {'ms': round(seconds * 1000, 1), 'count': int(count)}
+            for stage, (seconds, count) in self.stages.items()}
+
+
+_current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def start_request_timings() -> RequestTimings:
+    timings = RequestTimings()
+    _current_timings.set(timings)
+    return timings
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """Add the time to the stage of the current request; a no-op outside of a request, e.g. in the cron jobs."""
+    timings: Optional[RequestTimings] = _current_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    timings: Optional[RequestTimings] = _current_timings.get()
+    if timings is None:
+        yield
+        return
+
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(stage, time.perf_counter() - started_at)
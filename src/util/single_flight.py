@@ -0,0 +1,45 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Flight:
+
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task: asyncio.Task = task
+        self.waiters: int = 0
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time, concurrent callers with the same key share its outcome.
+
+    Both the result and the exception are shared; nothing is kept once the call is over.
+    The call runs in its own task, so a cancelled caller does not cancel it for the others;
+    once the last caller waiting on it is cancelled, nobody needs it anymore and it gets cancelled too.
+    """
+
+    def __init__(self) -> None:
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        flight: _Flight | None = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(call()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Forgotten right away, so a caller coming meanwhile starts a new call instead of joining this one.
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
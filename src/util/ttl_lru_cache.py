@@ -0,0 +1,41 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TtlLruCache(Generic[K, V]):
+    """In-process LRU cache bounded by the number of entries, every entry expires after the TTL."""
+
+    def __init__(self, max_size: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self._max_size = max_size
+        self._ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[K, Tuple[V, float]] = OrderedDict()
+
+    def get(self, key: K) -> Optional[V]:
+        entry: Optional[Tuple[V, float]] = self._entries.get(key)
+        if entry is None:
+            return None
+
+        value, expires_at = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: K, value: V) -> None:
+        self._entries[key] = (value, self._clock() + self._ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def evict(self, key: K) -> None:
+        self._entries.pop(key, None)
+
+    def size(self) -> int:
+        return len(self._entries)